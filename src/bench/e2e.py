@@ -0,0 +1,265 @@
+# Copyright 2026 The Ronny Voice Foundation
+
+"""
+Offline end-to-end benchmark. No microphone, speaker, network or API keys needed.
+
+Fixture WAVs (16kHz mono) are fed through the capture stream in real time so the recorder's endpointing runs for real,
+then transcribe.start and streaming.stream_data run against local stand-ins for Groq and Google with configurable
+latency, token rate and audio chunk size, and the audio goes to a null sink. Stage timings come from trace.py.
+
+Usage:
+    python src/bench/e2e.py [fixture folder or WAV files...] [--repeats 3] [--ttft 0.25] ...
+"""
+import argparse
+import json
+import random
+import resource
+import sys
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+import numpy as np
+import soundfile as sf
+from rich.console import Console
+
+from utils import calls, capture, playback, recorder, transcribe, streaming, trace
+from fixture_files import wav_files
+
+class EnergyVad:
+    """Stands in for Cobra: a voice probability worked out from how loud the frame is"""
+    frame_length = 512
+
+    def __init__(self, threshold=500):
+        self.threshold = threshold # RMS (int16) where the probability is 0.5
+
+    def process(self, pcm):
+        rms = np.sqrt(np.mean(np.square(pcm, dtype=np.float32)))
+        return float(1 / (1 + np.exp(-(rms - self.threshold) / (self.threshold / 4))))
+
+class FakeGroq:
+    """Stands in for the Groq client: Whisper and streamed chat completions"""
+    def __init__(self, options):
+        self.options = options
+        self.audio = SimpleNamespace(transcriptions=SimpleNamespace(create=self.transcribe))
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.complete))
+
+    def transcribe(self, model, file, prompt=None):
+        time.sleep(self.options.transcription_latency + len(file.getbuffer()) / self.options.upload_bytes_per_second)
+        return SimpleNamespace(text=self.options.transcript)
+
+    def complete(self, model, messages, stream=False, tools=None, **kwargs):
+        use_tool = tools and self.options.tool and messages[-1]["role"] == "user"
+        return self.stream_tool_call() if use_tool else self.stream_text()
+
+    def chunk(self, content=None, tool_calls=None):
+        return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content, tool_calls=tool_calls))])
+
+    def stream_tool_call(self):
+        time.sleep(self.options.ttft)
+        function = SimpleNamespace(name=self.options.tool, arguments="{}")
+        yield self.chunk(tool_calls=[SimpleNamespace(index=0, id="call_0", function=function)])
+
+    def stream_text(self):
+        time.sleep(self.options.ttft)
+        words = self.options.answer.split(" ")
+        for index, word in enumerate(words):
+            yield self.chunk(content=word if index == 0 else " " + word)
+            yield self.chunk(content="") # Groq sends plenty of these
+            time.sleep(1 / self.options.tokens_per_second)
+
+class FakeGoogle:
+    """Stands in for the Google TTS client: roughly 15 characters per second of audio at the configured speaking rate"""
+    def __init__(self, options):
+        self.options = options
+        self.messages = 0
+
+    def streaming_synthesize(self, requests, timeout=None):
+        bytes_per_second = streaming.audio_config.sample_rate_hertz * 2
+        first = True
+        for request in requests:
+            if not request.input.markup:
+                continue
+            self.messages += 1
+            if first:
+                time.sleep(self.options.tts_first_audio)
+                first = False
+            seconds = len(request.input.markup) / 15 / streaming.audio_config.speaking_rate
+            audio = bytes(int(seconds * bytes_per_second) // 2 * 2)
+            for start in range(0, len(audio), self.options.chunk_bytes):
+                time.sleep(random.uniform(0, self.options.chunk_jitter))
+                yield SimpleNamespace(audio_content=audio[start:start + self.options.chunk_bytes])
+
+class NullOutputStream:
+    """A speaker that plays nothing, but pulls audio from the callback as fast as a real one would"""
+    def __init__(self, callback, blocksize, realtime=True):
+        self.callback = callback
+        self.blocksize = blocksize
+        self.realtime = realtime
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run)
+        self.thread.start()
+
+    def run(self):
+        outdata = bytearray(self.blocksize * 2)
+        status = SimpleNamespace(output_underflow=False)
+        while self.running:
+            self.callback(outdata, self.blocksize, None, status)
+            time.sleep(self.blocksize / streaming.audio_config.sample_rate_hertz if self.realtime else 0.0005)
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join()
+
+    abort = stop
+
+    def close(self):
+        pass
+
+def feed(audio, stop):
+    """Play a fixture into the capture stream in real time, then silence until the recorder is done"""
+    frames = capture.frame_length
+    padded = np.concatenate((audio, np.zeros(frames - len(audio) % frames, np.int16)))
+    silence = np.zeros((frames, 1), np.int16)
+    status = SimpleNamespace(input_overflow=False)
+    started = time.perf_counter()
+    index = 0
+
+    while not stop.is_set():
+        start = index * frames
+        block = padded[start:start + frames].reshape(-1, 1) if start < len(padded) else silence
+        capture.callback(block, frames, SimpleNamespace(inputBufferAdcTime=started + index * frames / capture.sample_rate), status)
+        index += 1
+        time.sleep(max(started + index * frames / capture.sample_rate - time.perf_counter(), 0))
+
+def run_turn(audio, groq, google, console):
+    """One turn, like main.main does it. Returns (stage durations in ms, end of speech to first audio in ms)"""
+    trace.new_turn()
+    stop = threading.Event()
+    capture.mark_wake(capture.ring.position) # So the recorder gets the fixture from its very first frame
+    feeder = threading.Thread(target=feed, args=(audio, stop))
+    feeder.start()
+
+    try:
+        session = transcribe.StreamingTranscription(groq, recorder.sample_rate, recorder.cobra_frames) if transcribe.streaming else None
+        recording = recorder.start_recording(session.submit if session else None, session.partial if session else None)
+    finally:
+        stop.set()
+        feeder.join()
+    if recording is None:
+        return None, None
+
+    calls.begin_turn()
+    question = (session and session.finish()) or transcribe.start(groq, recorder.sample_rate, recording, probabilities=recorder.last_probabilities, frame_length=recorder.cobra_frames)
+    streaming.stream_data(groq, google, [{"role": "user", "content": question}], console)
+    calls.end_turn()
+
+    spans = [entry for entry in trace.pending if entry[0] == trace.turn]
+    stages = {}
+    for _, name, start, end, _ in spans:
+        stages[name] = stages.get(name, 0) + (end - start) * 1000
+    ends = {name: (start, end) for _, name, start, end, _ in spans}
+    end_to_end = None
+    if "endpointing" in ends and "tts_first_audio" in ends:
+        end_to_end = (ends["tts_first_audio"][1] - ends["endpointing"][0]) * 1000
+    return stages, end_to_end
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*", help="Fixture WAVs or folders of them (default: src/bench/fixtures)")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--transcript", default="What's the weather like today?")
+    parser.add_argument("--answer", default="It's sunny and about 72 degrees right now, with a light breeze. Perfect weather to go outside!")
+    parser.add_argument("--tool", default=None, help="Have the fake model call this tool first, like get_datetime")
+    parser.add_argument("--transcription-latency", type=float, default=0.3, help="Seconds for Whisper to answer, on top of the upload")
+    parser.add_argument("--upload-bytes-per-second", type=float, default=250_000, help="About 2Mbit/s of Pi Wi-Fi")
+    parser.add_argument("--ttft", type=float, default=0.25, help="Seconds to the first token of every completion")
+    parser.add_argument("--tokens-per-second", type=float, default=200)
+    parser.add_argument("--tts-first-audio", type=float, default=0.2, help="Seconds from the first text to the first audio")
+    parser.add_argument("--chunk-bytes", type=int, default=4800, help="Bytes per TTS audio chunk (4800 is 100ms at 24kHz)")
+    parser.add_argument("--chunk-jitter", type=float, default=0.0, help="Up to this many seconds of random delay before every TTS audio chunk")
+    parser.add_argument("--prebuffer", type=float, default=playback.prebuffer_time, help="Seconds of audio buffered before playback starts")
+    parser.add_argument("--no-realtime-playback", action="store_true", help="Don't wait for the null sink to 'play' the audio")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    options = parser.parse_args()
+
+    files = wav_files(options.paths)
+    clips = []
+    for file in files:
+        audio, rate = sf.read(str(file), dtype='int16')
+        if rate != capture.sample_rate or audio.ndim != 1:
+            print(f"Skipping {file.name}: needs to be {capture.sample_rate}Hz mono")
+            continue
+        clips.append((file.name, audio))
+    if not clips:
+        print("No fixture WAVs found!")
+        return
+
+    capture.start(EnergyVad.frame_length, open_stream=False)
+    recorder.setup(None, vad=EnergyVad())
+    playback.prebuffer_time = options.prebuffer
+    streaming.open_output_stream = lambda callback, blocksize: NullOutputStream(callback, blocksize, not options.no_realtime_playback)
+    groq, google = FakeGroq(options), FakeGoogle(options)
+    console = Console(quiet=True)
+
+    stages = {}
+    end_to_end = []
+    cpu_per_turn = []
+    vad_cpu = 0.0
+    vad_audio_time = 0.0
+    underruns = 0
+    for repeat in range(options.repeats):
+        for name, audio in clips:
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            turn_stages, turn_end_to_end = run_turn(audio, groq, google, console)
+            after = resource.getrusage(resource.RUSAGE_SELF)
+            if turn_stages is None:
+                print(f"{name}: no speech detected, try a lower EnergyVad threshold")
+                continue
+
+            cpu_per_turn.append((after.ru_utime - usage.ru_utime) + (after.ru_stime - usage.ru_stime))
+            underruns += streaming.player.stats["underruns"]
+            vad_cpu += recorder.stats["cpu_time"]
+            vad_audio_time += recorder.stats["frames"] * recorder.cobra_frames / recorder.sample_rate
+            for stage, duration in turn_stages.items():
+                stages.setdefault(stage, []).append(duration)
+            if turn_end_to_end is not None:
+                end_to_end.append(turn_end_to_end)
+            print(f"[{repeat + 1}/{options.repeats}] {name}: end of speech to first audio {turn_end_to_end or 0:.0f}ms")
+
+    results = {
+        "turns": len(cpu_per_turn),
+        "end_to_end_ms": {"p50": trace.percentile(end_to_end, 0.5), "p95": trace.percentile(end_to_end, 0.95)} if end_to_end else None,
+        "stages_ms": {stage: {"p50": trace.percentile(values, 0.5), "p95": trace.percentile(values, 0.95)} for stage, values in sorted(stages.items())},
+        "cpu_seconds_per_turn": float(np.mean(cpu_per_turn)) if cpu_per_turn else None,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, # KB on Linux
+        "tts_messages_per_turn": google.messages / max(len(cpu_per_turn), 1),
+        "playback_underruns": underruns,
+        "vad_cpu_ms_per_audio_second": vad_cpu / vad_audio_time * 1000 if vad_audio_time else None,
+    }
+    trace.pending.clear() # Benchmark spans don't belong in the real trace log
+
+    if options.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"\n{results['turns']} turns")
+    if end_to_end:
+        print(f"{'end of speech to first audio':<32}{results['end_to_end_ms']['p50']:>10.0f}{results['end_to_end_ms']['p95']:>10.0f}")
+    print(f"{'stage':<32}{'p50 ms':>10}{'p95 ms':>10}")
+    for stage, values in results["stages_ms"].items():
+        print(f"{stage:<32}{values['p50']:>10.0f}{values['p95']:>10.0f}")
+    print(f"\nCPU per turn: {results['cpu_seconds_per_turn']:.3f}s, peak RSS: {results['peak_rss_mb']:.1f}MB, TTS messages per turn: {results['tts_messages_per_turn']:.1f}, playback underruns: {underruns}")
+    print(f"VAD CPU per second of audio: {results['vad_cpu_ms_per_audio_second'] or 0:.2f}ms")
+
+if __name__ == "__main__":
+    main()
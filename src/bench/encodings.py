@@ -0,0 +1,45 @@
+# Copyright 2026 The Ronny Voice Foundation
+
+"""
+Encodes fixture WAVs with every upload encoding and prints the size and encode time of each, no network needed.
+Run it on the Pi and pair it with your upload speed (or transcribe.report() from real turns) to pick transcribe.encoding.
+
+Usage: python src/bench/encodings.py [fixture folder or WAV files...]
+"""
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+import soundfile as sf
+
+from utils import transcribe
+from fixture_files import wav_files
+
+def main(paths, repeats=5):
+    files = wav_files(paths)
+    if not files:
+        print("No fixture WAVs found!")
+        return
+
+    clips = [sf.read(str(file), dtype='float32') for file in files] # float32, the same as what the recorder used to hand over
+    seconds = sum(len(audio) / rate for audio, rate in clips)
+
+    for name in transcribe.encodings:
+        transcribe.encoding = name
+        total_bytes = 0
+        started = time.perf_counter()
+        try:
+            for _ in range(repeats):
+                for audio, rate in clips:
+                    total_bytes += transcribe.encode(audio, rate).getbuffer().nbytes
+        except Exception as e: # Usually opus on an older libsndfile
+            print(f"{name}: not supported here ({e})")
+            continue
+        encode_time = (time.perf_counter() - started) / repeats
+        print(f"{name}: {total_bytes / repeats / seconds / 1024:.1f}KB per second of audio, encode {encode_time / seconds * 1000:.1f}ms per second of audio")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,183 @@
+# Copyright 2026 The Ronny Voice Foundation
+
+"""
+Offline evaluation of the recorder's endpointing: how long after the user stops talking the recording ends,
+against how often it ends before they're actually done.
+
+Every fixture WAV (16kHz mono) needs a label next to it with the same name, like fixtures/weather.json:
+    {"end": 2.35}
+where end is the second the question really ends (after any mid-question pauses). The clips get padded with silence,
+run through the VAD once, and then the old fixed rule and the adaptive Endpointer are both played over the same voice
+probabilities. --sweep tries other base_silence_time values too, to pick one.
+
+With --transcribe, the pieces streaming transcription would send get transcribed by Whisper for real, and the
+transcript confirmation (recorder.confirm_with_transcript, off by default) is turned on to end the recording once each
+piece would have come back.
+
+Usage: python src/bench/endpointing.py [fixture folder or WAV files...] [--energy] [--transcribe] [--sweep 0.6,0.9,1.2]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+import numpy as np
+import soundfile as sf
+
+from utils import recorder, trace
+from fixture_files import wav_files
+
+def fixed_endpoint(probabilities, frame_time):
+    """The frame the recording ended on before the Endpointer: 2 seconds under a hard 0.8 threshold"""
+    talked = False
+    silent = 0
+    for index, probability in enumerate(probabilities):
+        if probability > 0.8:
+            talked = True
+            silent = 0
+            continue
+        silent += 1
+        if silent * frame_time > (2 if talked else recorder.not_talking_time):
+            return index
+    return None
+
+def adaptive_endpoint(probabilities, frame_length, partials=()):
+    """
+    The frame the Endpointer ends the recording on, with the current settings.
+
+    :param partials: (frame it's ready on, frames it covers, transcript) for every piece streaming transcription sends
+    """
+    endpointer = recorder.Endpointer(frame_length, recorder.sample_rate)
+    partial = None
+    upcoming = list(partials)
+    for index, probability in enumerate(probabilities):
+        if endpointer.push(probability):
+            return index, False
+        while upcoming and upcoming[0][0] <= index:
+            partial = upcoming.pop(0)
+        if partial and endpointer.confirms(partial[2], partial[1]):
+            return index, True
+    return None, False
+
+def transcribe_partials(client, audio, probabilities, frame_length):
+    """Cut the clip into pieces like the live recorder and transcribe them in order, like StreamingTranscription"""
+    from utils import transcribe
+
+    frame_time = frame_length / recorder.sample_rate
+    segmenter = recorder.PauseSegmenter(frame_length, recorder.sample_rate)
+    partials = []
+    texts = []
+    segment_start = 0
+    ready = 0.0 # Seconds into the clip the last piece came back
+    for index, probability in enumerate(probabilities):
+        if not segmenter.push(probability):
+            continue
+        started = time.perf_counter()
+        piece = audio[segment_start * frame_length:(index + 1) * frame_length]
+        texts.append(transcribe.start(client, recorder.sample_rate, piece, " ".join(texts) or None, probabilities[segment_start:index + 1], frame_length).strip())
+        ready = max(ready, (index + 1) * frame_time) + time.perf_counter() - started # One at a time, like segment_executor
+        partials.append((int(ready / frame_time), index + 1, " ".join(text for text in texts if text)))
+        segment_start = index + 1
+    return partials
+
+def summarize(results):
+    """results is a list of (endpoint - labeled end in seconds, or None if it never ended). Returns a row for the table"""
+    ended = [value for value in results if value is not None]
+    premature = [value for value in ended if value < 0]
+    latencies = [value * 1000 for value in ended if value >= 0]
+    return {
+        "clips": len(results),
+        "premature": len(premature),
+        "premature_rate": len(premature) / max(len(results), 1),
+        "never_ended": len(results) - len(ended),
+        "latency_ms": {"p50": trace.percentile(latencies, 0.5), "p95": trace.percentile(latencies, 0.95)} if latencies else None,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*", help="Fixture WAVs or folders of them (default: src/bench/fixtures)")
+    parser.add_argument("--energy", action="store_true", help="Use the e2e benchmark's loudness VAD instead of Cobra (no Picovoice key needed)")
+    parser.add_argument("--transcribe", action="store_true", help="Turn the transcript confirmation on, using Whisper on Groq")
+    parser.add_argument("--sweep", default="", help="Other base_silence_time values to try, comma separated")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    options = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    if options.energy:
+        from e2e import EnergyVad
+        vad = EnergyVad()
+    else:
+        import pvcobra
+        vad = pvcobra.create(os.environ['PICOVOICE_KEY'])
+    client = None
+    if options.transcribe:
+        from groq import Groq
+        client = Groq(api_key=os.environ['GROQ_API_KEY'])
+        recorder.confirm_with_transcript = True
+    frame_length = vad.frame_length
+    frame_time = frame_length / recorder.sample_rate
+
+    files = wav_files(options.paths)
+
+    clips = []
+    for file in files:
+        label = file.with_suffix(".json")
+        if not label.exists():
+            print(f"Skipping {file.name}: no {label.name} saying where the question ends")
+            continue
+        audio, rate = sf.read(str(file), dtype='int16')
+        if rate != recorder.sample_rate or audio.ndim != 1:
+            print(f"Skipping {file.name}: needs to be {recorder.sample_rate}Hz mono")
+            continue
+        # Enough silence after the clip for even the longest window to run out
+        padding = int((recorder.finished_speaking_time + 1) * rate)
+        audio = np.concatenate((audio, np.zeros(padding + frame_length - (len(audio) + padding) % frame_length, np.int16)))
+        frames = audio.reshape(-1, frame_length)
+        loud = np.sqrt(np.mean(np.square(frames, dtype=np.float32), axis=1)) >= recorder.gate_rms # Same gate as recorder.process_frames
+        probabilities = [vad.process(frame) if is_loud else 0.0 for frame, is_loud in zip(frames, loud)]
+        partials = transcribe_partials(client, audio, probabilities, frame_length) if client else []
+        clips.append((file.name, json.loads(label.read_text())["end"], probabilities, partials))
+    if not clips:
+        print("No labeled fixture WAVs found!")
+        return
+
+    def offset(frame, end):
+        return None if frame is None else (frame + 1) * frame_time - end
+
+    rows = {"fixed 2s": summarize([offset(fixed_endpoint(probabilities, frame_time), end) for _, end, probabilities, _ in clips])}
+    confirmed = 0
+    default_base = recorder.base_silence_time
+    for base in [default_base] + [float(value) for value in options.sweep.split(",") if value]:
+        recorder.base_silence_time = base
+        results = []
+        for name, end, probabilities, partials in clips:
+            frame, by_transcript = adaptive_endpoint(probabilities, frame_length, partials)
+            results.append(offset(frame, end))
+            if base == default_base and by_transcript:
+                confirmed += 1
+            if base == default_base and not options.json:
+                ended = "never ended" if results[-1] is None else f"adaptive ended {results[-1]:+.2f}s after it"
+                print(f"{name}: labeled end {end:.2f}s, {ended}{' (transcript)' if by_transcript else ''}")
+        rows[f"adaptive base {base}s" + (" (default)" if base == default_base else "")] = summarize(results)
+    recorder.base_silence_time = default_base
+    if not options.energy:
+        vad.delete()
+
+    if options.json:
+        print(json.dumps({"rows": rows, "confirmed_by_transcript": confirmed}, indent=2))
+        return
+
+    print(f"\n{len(clips)} clips, {confirmed} ended by the transcript" + ("" if options.transcribe else " (off, use --transcribe)"))
+    print(f"{'rule':<32}{'premature':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for rule, row in rows.items():
+        latency = row["latency_ms"] or {"p50": float("nan"), "p95": float("nan")}
+        print(f"{rule:<32}{row['premature_rate']:>10.1%}{latency['p50']:>10.0f}{latency['p95']:>10.0f}")
+
+if __name__ == "__main__":
+    main()
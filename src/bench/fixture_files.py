@@ -0,0 +1,24 @@
+# Copyright 2026 The Ronny Voice Foundation
+
+"""
+Finding the WAVs a benchmark should run on, shared by the benchmark scripts in this folder.
+"""
+from pathlib import Path
+
+default_folder = Path(__file__).resolve().parent / "fixtures"
+
+def wav_files(paths=None):
+    """
+    Every WAV in the given files and folders, skipping (and saying so) any path that doesn't exist.
+
+    :param paths: WAV files or folders of them. Defaults to src/bench/fixtures
+    """
+    files = []
+    for path in map(Path, paths or [default_folder]):
+        if path.is_dir():
+            files += sorted(path.glob("*.wav"))
+        elif path.exists():
+            files.append(path)
+        else:
+            print(f"Skipping {path}: doesn't exist (python src/bench/make_fixtures.py makes the default fixtures)")
+    return files
@@ -0,0 +1,75 @@
+# Copyright 2026 The Ronny Voice Foundation
+
+"""
+Makes the default fixtures in src/bench/fixtures: a few 16kHz mono WAVs of speech-like sound (a buzzing voice with
+vowel-ish formants, broken into syllables) over quiet room noise, each with the label bench/endpointing.py needs.
+
+They're made up so the benchmarks can run anywhere without a microphone, and they're shaped like the cases endpointing
+has to get right: a one word answer, a normal question, one with a short pause and one with a long thinking pause.
+Cobra and Whisper don't think they're speech, so e2e.py's loudness VAD (and endpointing.py --energy) is what they're for.
+Record real questions for transcription_accuracy.py.
+
+Usage: python src/bench/make_fixtures.py [output folder]
+"""
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+sample_rate = 16000
+noise_level = 30 # int16 RMS of the room noise, well under recorder.gate_rms
+speech_level = 3000
+syllable_time = 0.22
+
+# name -> the clip, as seconds of ("noise" or "speech", seconds)
+clips = {
+    "one_word": [("noise", 0.4), ("speech", 0.45), ("noise", 0.2)],
+    "question": [("noise", 0.3), ("speech", 2.2), ("noise", 0.2)],
+    "short_pause": [("noise", 0.3), ("speech", 1.3), ("noise", 0.45), ("speech", 1.1), ("noise", 0.2)],
+    "thinking_pause": [("noise", 0.3), ("speech", 0.9), ("noise", 1.1), ("speech", 0.8), ("noise", 0.2)],
+}
+
+def speech(seconds, rng):
+    """A voice-ish buzz: harmonics of a wobbling pitch, shaped by two formants that change every syllable"""
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    pitch = 120 + 15 * np.sin(2 * np.pi * 3 * t) + rng.uniform(-10, 10)
+    phase = 2 * np.pi * np.cumsum(pitch) / sample_rate
+    syllable = (t // syllable_time).astype(int)
+    formants = rng.uniform((300, 900), (900, 2400), (syllable.max() + 1, 2))[syllable]
+
+    audio = np.zeros_like(t)
+    for harmonic in range(1, 30):
+        frequency = pitch * harmonic
+        weight = sum(np.exp(-((frequency - formants[:, index]) / 150) ** 2) for index in range(2)) + 0.05
+        audio += weight / harmonic * np.sin(harmonic * phase)
+
+    envelope = np.sin(np.pi * (t % syllable_time) / syllable_time) ** 0.5 # Each syllable swells and fades
+    audio *= envelope
+    return audio / np.sqrt(np.mean(audio ** 2)) * speech_level
+
+def make(parts, rng):
+    """Returns the int16 audio and the second the speech ends"""
+    pieces = []
+    end = 0.0
+    for kind, seconds in parts:
+        count = int(seconds * sample_rate)
+        piece = speech(seconds, rng) if kind == "speech" else np.zeros(count)
+        pieces.append(piece + rng.normal(0, noise_level, count))
+        if kind == "speech":
+            end = sum(len(piece) for piece in pieces) / sample_rate
+    return np.concatenate(pieces).clip(-32768, 32767).astype(np.int16), end
+
+def main(folder=None):
+    folder = Path(folder) if folder else Path(__file__).resolve().parent / "fixtures"
+    folder.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(0) # Same fixtures every time
+    for name, parts in clips.items():
+        audio, end = make(parts, rng)
+        sf.write(str(folder / f"{name}.wav"), audio, sample_rate, subtype="PCM_16")
+        (folder / f"{name}.json").write_text(json.dumps({"end": round(end, 3)}) + "\n")
+        print(f"{name}.wav: {len(audio) / sample_rate:.2f}s, speech ends at {end:.2f}s")
+
+if __name__ == "__main__":
+    main(*sys.argv[1:2])
@@ -0,0 +1,98 @@
+# Copyright 2026 The Ronny Voice Foundation
+
+"""
+Microbenchmark for recorder.callback: time per call and allocations per call, old path vs the ring buffer.
+Cobra is swapped for a stand-in that doesn't allocate, so only the recorder's own work is measured.
+The callback only copies now, so the VAD batches (recorder.process_frames) get timed separately, for silent and loud audio.
+
+Usage: python src/bench/recorder_callback.py [calls]
+"""
+import sys
+import queue
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+
+from utils import recorder
+
+class FakeCobra:
+    frame_length = 512
+
+    def process(self, pcm):
+        return 0.9
+
+def make_legacy_callback(handle):
+    """The callback from before the ring buffer, minus the endpointing (which didn't change)"""
+    legacy_queue = queue.Queue()
+    chunks = []
+
+    def callback(indata, frames, time, status):
+        pcm = (indata.flatten() * 32767).astype(np.int16)
+        voice_probability = handle.process(pcm)
+        legacy_queue.put((indata.copy(), voice_probability))
+        chunks.append(legacy_queue.get()) # What start_recording did on the other end
+
+    return callback
+
+def measure(callback, block, calls):
+    """
+    Returns (microseconds per call, allocations per call).
+    Allocations are the blocks still held after the calls, which is what piles up over a 15 second recording.
+    """
+    for _ in range(50): # Warm up
+        callback(block, len(block), None, None)
+
+    started = time.perf_counter()
+    for _ in range(calls):
+        callback(block, len(block), None, None)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for _ in range(calls):
+        callback(block, len(block), None, None)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocations = sum(stat.count_diff for stat in after.compare_to(before, "filename") if stat.count_diff > 0)
+
+    return elapsed / calls * 1e6, allocations / calls
+
+def main(calls=2000):
+    handle = FakeCobra()
+    recorder.handle = handle
+    recorder.cobra_frames = handle.frame_length
+    # Big enough for both measured runs and the warm ups so the ring buffer never stops early
+    recorder.audio_buffer = recorder.RingBuffer((calls * 2 + 100) * handle.frame_length, np.int16)
+    recorder.probability_buffer = recorder.RingBuffer(calls * 2 + 100, np.float32)
+    recorder.endpointer = recorder.Endpointer(handle.frame_length, recorder.sample_rate)
+
+    float_block = np.random.uniform(-0.1, 0.1, (handle.frame_length, 1)).astype(np.float32)
+    int_block = (float_block * 32767).astype(np.int16)
+
+    legacy_time, legacy_allocations = measure(make_legacy_callback(handle), float_block, calls)
+    ring_time, ring_allocations = measure(lambda indata, frames, time, status: recorder.callback(indata[:, 0], 0), int_block, calls)
+
+    print(f"{calls} calls, {handle.frame_length} frames per block")
+    print(f"before (float32 + queue + list): {legacy_time:.1f}us per call, {legacy_allocations:.1f} allocations per call")
+    print(f"after (int16 ring buffer):       {ring_time:.1f}us per call, {ring_allocations:.1f} allocations per call")
+
+    batch = max(int(recorder.poll_interval * recorder.sample_rate / handle.frame_length), 1)
+    for name, block in (("silent", np.zeros_like(int_block)), ("loud", int_block)):
+        recorder.audio_buffer.reset()
+        recorder.probability_buffer.reset()
+        recorder.stats = {"frames": 0, "gated_frames": 0, "batches": 0, "cpu_time": 0.0}
+        elapsed = 0
+        for _ in range(calls // batch):
+            for _ in range(batch):
+                recorder.callback(block[:, 0], 0)
+            started = time.perf_counter()
+            recorder.process_frames()
+            elapsed += time.perf_counter() - started
+        print(f"VAD in batches of {batch} ({name}): {elapsed / max(recorder.stats['frames'], 1) * 1e6:.1f}us per frame off the audio thread, {recorder.stats['gated_frames']} of {recorder.stats['frames']} gated")
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:2]))
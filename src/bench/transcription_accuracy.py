@@ -0,0 +1,95 @@
+# Copyright 2026 The Ronny Voice Foundation
+
+"""
+Checks that streaming transcription is as accurate as transcribing the whole clip at once.
+
+Every fixture WAV (16kHz mono) gets split at pauses the same way recorder.start_recording does it live,
+then both versions are sent to Whisper and compared with word error rate.
+
+Usage: python src/bench/transcription_accuracy.py [fixture folder or WAV files...]
+"""
+import sys
+import os
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+import numpy as np
+import soundfile as sf
+import pvcobra
+from dotenv import load_dotenv
+from groq import Groq
+
+from utils import recorder, transcribe
+from fixture_files import wav_files
+
+def normalize(text):
+    return "".join(char for char in text.lower() if char.isalnum() or char.isspace()).split()
+
+def word_error_rate(reference, hypothesis):
+    """Levenshtein distance over words, divided by the number of reference words"""
+    reference, hypothesis = normalize(reference), normalize(hypothesis)
+    distances = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, 1):
+        previous, distances[0] = distances[0], i
+        for j, hyp_word in enumerate(hypothesis, 1):
+            previous, distances[j] = distances[j], min(distances[j] + 1, distances[j - 1] + 1, previous + (ref_word != hyp_word))
+    return distances[-1] / max(len(reference), 1)
+
+def split_segments(cobra, audio):
+    """Cut a clip into segments the same way the live recorder does"""
+    frame_length = cobra.frame_length
+    segmenter = recorder.PauseSegmenter(frame_length, recorder.sample_rate)
+    segments = []
+    probabilities = []
+    segment_start = 0
+
+    for start in range(0, len(audio) - frame_length + 1, frame_length):
+        probabilities.append(cobra.process(audio[start:start + frame_length]))
+        if segmenter.push(probabilities[-1]):
+            segments.append((audio[segment_start * frame_length:start + frame_length], probabilities[segment_start:]))
+            segment_start = len(probabilities)
+    if segmenter.has_speech:
+        segments.append((audio[segment_start * frame_length:], probabilities[segment_start:]))
+    return segments
+
+def main(paths):
+    load_dotenv()
+    client = Groq(api_key=os.environ['GROQ_API_KEY'])
+    cobra = pvcobra.create(os.environ['PICOVOICE_KEY'])
+
+    files = wav_files(paths)
+
+    rates = []
+    for file in files:
+        audio, rate = sf.read(str(file), dtype='int16')
+        if rate != recorder.sample_rate:
+            print(f"Skipping {file.name}: needs to be {recorder.sample_rate}Hz, not {rate}Hz")
+            continue
+
+        whole = transcribe.start(client, rate, audio)
+
+        session = transcribe.StreamingTranscription(client, rate, cobra.frame_length)
+        segments = split_segments(cobra, audio)
+        for segment, probabilities in segments:
+            session.submit(segment, probabilities)
+        started = time.perf_counter()
+        streamed = session.finish()
+        finish_time = time.perf_counter() - started # Roughly what's left after endpointing, since everything was submitted at once here
+
+        rate_of_error = word_error_rate(whole, streamed)
+        rates.append(rate_of_error)
+        print(f"{file.name}: {len(segments)} segments, WER vs whole clip {rate_of_error:.1%}, finish wait {finish_time:.2f}s")
+        print(f"  whole:    {whole.strip()}")
+        print(f"  streamed: {streamed}")
+
+    if rates:
+        print(f"\nMean WER vs whole clip over {len(rates)} files: {np.mean(rates):.1%}")
+    else:
+        print("No fixture WAVs found!")
+    cobra.delete()
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,9 +1,14 @@
 # Copyright 2026 The Ronny Voice Foundation
 
+# Startup profiling goes first so it sees every import after it
+from utils import startup
+startup.begin()
+
 # Other scripts
 # import pvporcupine
 import pvporcupine
-from utils import recorder, transcribe, streaming
+from utils import recorder, transcribe, capture, idle, earcon, trace, intents, tools, connections, compact, bargein, calls, router
+from utils.context import ContextWindow
 
 # Environment variables
 from dotenv import load_dotenv
@@ -12,34 +17,61 @@ import os
 # TUI stuff
 from rich import print
 from rich.console import Console
-from rich_gradient import Gradient
+
+import asyncio
+import sys
 
 # Loading files
 from pathlib import Path
 BASE_DIR = Path(__file__).resolve().parent
 
-load_dotenv()
-
-# Google stuff (text-to-speech)
-from google.cloud import texttospeech
-google_client = texttospeech.TextToSpeechClient() # Doing this here to prevent a race condition with load_dotenv()
+load_dotenv() # Before any of the clients get built, they read their keys from here
 
-# Groq stuff (text-to-text and speech-to-text)
-from groq import Groq
 GROQ_API_KEY = os.environ['GROQ_API_KEY']
-groq_client = Groq(api_key=GROQ_API_KEY)
-context = []
-max_context_message_count = 15
-
-# PVPorcupine stuff (wake word detection and now also voice active detection thing to stop recording when done)
 PICOVOICE_KEY = os.environ['PICOVOICE_KEY']
+
+context = ContextWindow() # Trimmed to a token budget, see utils/context.py
+
+# Everything the wake word doesn't need gets built in the background while it's listening
+def build_google_client():
+    # Google stuff (text-to-speech)
+    from google.cloud import texttospeech
+    client = texttospeech.TextToSpeechClient()
+    connections.register_google(client)
+    return client
+
+def build_groq_client():
+    # Groq stuff (text-to-text and speech-to-text)
+    from groq import Groq
+    client = Groq(api_key=GROQ_API_KEY, http_client=connections.groq_http_client())
+    connections.register_groq(client)
+    return client
+
+def load_streaming():
+    from utils import streaming # Pulls in google.cloud.texttospeech
+    return streaming
+
+startup.background("google client", build_google_client)
+startup.background("groq client", build_groq_client)
+startup.background("streaming module", load_streaming)
+startup.background("cobra", lambda: recorder.setup(PICOVOICE_KEY))
+startup.background("earcons", earcon.load)
+
+def warm_connections():
+    startup.result("groq client")
+    startup.result("google client")
+    connections.keep_alive() # The handshakes happen now instead of on the first question
+startup.background("connections", warm_connections)
+
+# PVPorcupine stuff (wake word detection). This and the microphone are the only things needed before listening
 MODEL_PATH = BASE_DIR / "utils" / "wakeword" / "model" / "model_mac.ppn"
 porcupine_client = None
 try:
-    porcupine_client = pvporcupine.create(
-        access_key=PICOVOICE_KEY,
-        keyword_paths=[MODEL_PATH.as_posix()]
-    )
+    with startup.timed("porcupine"):
+        porcupine_client = pvporcupine.create(
+            access_key=PICOVOICE_KEY,
+            keyword_paths=[MODEL_PATH.as_posix()]
+        )
 except pvporcupine.PorcupineActivationError as e:
     print(f"Failed to activate Porcupine: {e}")
     exit(1)
@@ -57,10 +89,15 @@ def append_context(is_user, response):
     else:
         context.append({'role': 'assistant', 'content': response})
 
-    if len(context) > max_context_message_count: # Based on this setup, you only need to check once and it won't go over.
-        del context[0] # Item 0 is always the oldest in the list
+    context.trim() # Also counts the tool messages streaming.py added during the turn
 
-recorder.setup(PICOVOICE_KEY)
+with startup.timed("microphone"):
+    capture.start(porcupine_client.frame_length) # One microphone stream for everything, opened once
+idle.register("trace_flush", trace.flush, 30)
+idle.register("keep_alive", connections.keep_alive, connections.keepalive_interval, run_now=False) # Startup already warmed them
+idle.register("weather_refresh", lambda: tools.load_module("weather").refresh_if_due(), 60) # So the weather tools answer from memory
+idle.register("tool_preload", tools.preload, float("inf")) # Once, after the wake word is armed, so startup doesn't pay for openmeteo and friends
+idle.register("context_summary", lambda: context.refresh_summary(startup.result("groq client")), 10) # Does nothing unless turns were dropped with summarizing on
 
 is_running = False
 
@@ -71,7 +108,21 @@ from utils.wakeword import wakeword
 
 console = Console()
 
+async def print_startup_report():
+    """Once everything in the background is built, show where the startup time went"""
+    for future in list(startup.futures.values()):
+        await asyncio.wrap_future(future)
+    for line in startup.report() + connections.report():
+        console.print(f"[dim]{line}[/dim]", highlight=False)
+
 async def main():
+    global groq_client
+    global google_client
+    global streaming
+
+    with startup.timed("rich_gradient"):
+        from rich_gradient import Gradient
+
     console.clear()
     print("\n")
     print(Gradient(""":::::::..       ...   :::.    :::.:::.    :::..-:.     ::-.    :::      .::.  ...     :::  .,-::::: .,::::::  
@@ -81,20 +132,58 @@ async def main():
  888b "88bo,"888,_ _,88P888    Y88  888    Y88   ,8P"`            Y88P    "888,_ _,88P888`88bo,__,o, 888oo,__ 
  MMMM   \"W\"   \"YMMMMMP\" MMM     YM  MMM     YM  mM\"                MP       \"YMMMMMP\" MMM  \"YUMMMMMP\"\"\"\"\"YUMMM""", colors=["red", "orange", "blue"], justify='center'))
     console.rule(style="red")
+    asyncio.create_task(idle.run()) # Background jobs, only run while waiting for the wake word
+    first_wait = True
     while True:
         print("[italic]Waiting for wake word[white]...[/white][/italic]")
+        trace.new_turn()
 
         if porcupine_client:
-            await wakeword.wait_for_wake_word(porcupine_client)
+            idle.is_idle = True
+            waiting = asyncio.create_task(wakeword.wait_for_wake_word(porcupine_client))
+            if first_wait:
+                await asyncio.sleep(0) # Let it start listening
+                startup.mark_armed()
+                startup.stop_profiling()
+                asyncio.create_task(print_startup_report())
+                first_wait = False
+            await waiting
+            idle.is_idle = False
+            connections.warm() # While the user is still talking, in case they went cold
             print("[bold green]Detected wakeword![/bold green] [italic]Waking up[white]...[/white][italic]")
         else:
             print("[red bold]WARNING:[/red bold] Wakeword system disabled!!")
 
+        # Usually done long before the first wake word, but the first turn waits if they aren't
+        groq_client = await startup.wait("groq client")
+        google_client = await startup.wait("google client")
+        streaming = await startup.wait("streaming module")
+        await startup.wait("cobra")
+        bargein.setup(porcupine_client, recorder.handle) # Both are free while the answer plays, so they listen for the user talking over it
+
         is_running = True
 
         while is_running:
             with console.status("Listening...", spinner="dots") as status:
-                audio = recorder.start_recording()
+                session = transcribe.StreamingTranscription(groq_client, recorder.sample_rate, recorder.cobra_frames) if transcribe.streaming else None
+                audio = await asyncio.to_thread(recorder.start_recording, session.submit if session else None, session.partial if session else None)
+                if capture.stats["wake_to_recording"] is not None:
+                    console.print(f"[dim]Wake to recording {capture.stats['wake_to_recording'] * 1000:.0f}ms, {capture.stats['dropped_frames']} dropped frames, {capture.stats['overflows']} overflows, earcons saved {earcon.stats['saved_seconds']:.2f}s so far[/dim]")
+                    capture.stats["wake_to_recording"] = None
+                    console.print(f"[dim]{recorder.report()}[/dim]")
+                    console.print(f"[dim]Connections: {'; '.join(connections.report())}[/dim]")
+                    if "utils.tools.weather" in sys.modules: # Not worth importing just to say nothing happened
+                        console.print(f"[dim]{sys.modules['utils.tools.weather'].report()}[/dim]")
+                    if calls.stats:
+                        console.print(f"[dim]Requests: {'; '.join(calls.report())}[/dim]")
+                    if compact.stats:
+                        console.print(f"[dim]Tool results: {'; '.join(compact.report())}[/dim]")
+                    if router.stats:
+                        console.print(f"[dim]Models: {'; '.join(router.report())}[/dim]")
+                    if streaming.tool_stats:
+                        console.print(f"[dim]Tools: {'; '.join(streaming.tool_report())}[/dim]")
+                    if tools.import_times:
+                        console.print(f"[dim]Tool imports: {'; '.join(tools.report())}[/dim]")
 
                 if audio is None:
                     print("\n[red bold]WARNING:[/red bold] Audio not found! [italic]Going back to listening for wake word[white]...[/white][/italic]")
@@ -102,7 +191,24 @@ async def main():
 
                 status.update("Transcribing...\n", spinner_style="yellow")
 
-                question = transcribe.start(groq_client, recorder.sample_rate, audio)
+                calls.begin_turn() # Every request from here until the answer is done shares one deadline
+                question = None
+                upload = transcribe.last_upload
+                if session:
+                    try:
+                        question = await asyncio.to_thread(session.finish)
+                        if question: # Otherwise it gets sent again as one clip below
+                            upload = session.upload
+                    except Exception as e: # The whole clip is still there, send it in one go instead
+                        print(f"\n[red bold]WARNING:[/red bold] Streaming transcription failed: {e} [italic]Sending the whole recording[white]...[/white][/italic]")
+                try:
+                    question = question or await asyncio.to_thread(transcribe.start, groq_client, recorder.sample_rate, audio, probabilities=recorder.last_probabilities, frame_length=recorder.cobra_frames)
+                except Exception as e:
+                    print(f"\n[red bold]WARNING:[/red bold] Couldn't transcribe: {e} [italic]Going back to listening for wake word[white]...[/white][/italic]")
+                    calls.end_turn()
+                    break
+                segments = f" in {upload['segments']} segments" if upload.get("segments", 1) > 1 else ""
+                console.print(f"[dim]Uploaded {upload['bytes'] / 1024:.1f}KB of {upload['encoding']}{segments} (encode {upload['encode_time'] * 1000:.0f}ms, upload {upload['upload_time'] * 1000:.0f}ms)[/dim]")
                 console.print('[yellow bold]Transcribed question:[/yellow bold] [italic]' + question + "[/italic]")
                 
                 trimmed_question = question.replace(" ", "").replace(".", "").replace("!", "").replace("?", "").replace(",", "").lower()
@@ -117,12 +223,21 @@ async def main():
                 #     break
                 
                 append_context(True, question)
-
-            ai_response = streaming.stream_data(groq_client, google_client, context, console)
+                fast_answer = await asyncio.to_thread(intents.match, question) # Simple stuff like the time doesn't need the LLM at all. The weather one can hit the network
+
+            if fast_answer:
+                console.print(f"[dim]{intents.report()}[/dim]")
+            try:
+                ai_response = await asyncio.to_thread(streaming.stream_data, groq_client, google_client, context, console, fast_answer)
+                # If the user barged in this is only what got generated before then, and the loop goes right back to recording
+            except Exception as e:
+                print(f"\n[red bold]WARNING:[/red bold] Couldn't say the answer: {e} [italic]Going back to listening for wake word[white]...[/white][/italic]")
+                break
+            finally:
+                calls.end_turn()
             append_context(False, ai_response)
             console.print("\n")
             console.rule(style="blue")
+            trace.new_turn() # Still in the conversation, the next question is a new turn
 
-import asyncio
-loop = asyncio.get_event_loop()
-loop.run_until_complete(main())
\ No newline at end of file
+asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,110 @@
+# Copyright 2026 The Ronny Voice Foundation
+
+"""
+Barge-in: the user can talk over the assistant to stop it. While an answer is playing the wake word and Cobra keep
+listening on the shared capture stream (on a worker thread, not the audio callback), and when either goes off streaming.py cancels the Groq stream, ends the TTS stream,
+throws away whatever audio is still queued for the speaker, and the conversation goes straight back to recording.
+
+The microphone hears the speaker too, and Cobra can't tell the assistant's voice from the user's, so only the wake word
+interrupts by default. Turn on use_vad if the microphone and speaker are far enough apart (or it's a headset), and then
+Cobra needs a higher probability than usual, for longer, before it counts.
+"""
+import threading
+import time
+
+from . import capture, trace
+
+# Settings
+enabled = True
+use_vad = False # Plain talking interrupts too, not just the wake word. Only if the speaker's echo can't set it off (see above)
+voice_threshold = 0.95 # Cobra probability that counts as the user talking over playback, with use_vad. Higher than recorder.py's, because of the echo
+hold_time = 0.3 # Seconds of talking in a row before it counts, so a cough or the assistant's own voice doesn't do it
+ignore_time = 0.25 # Seconds at the start of playback where nothing counts, while the echo is at its least predictable
+
+wake_word = None # Porcupine, set in setup()
+vad = None # Cobra, set in setup()
+
+interrupted = threading.Event() # Set when the user barges in. streaming.py checks it
+detected_at = None
+listening_since = None
+voiced_frames = 0
+
+stats = {
+    "interruptions": 0,
+    "by_wake_word": 0,
+    "by_voice": 0,
+    "last_cancel_to_silence": None, # Seconds from detection to the speaker going quiet
+    "total_cancel_to_silence": 0.0,
+}
+
+def setup(porcupine=None, cobra=None):
+    """Give it the wake word and VAD to listen with. Either can be None"""
+    global wake_word
+    global vad
+    wake_word = porcupine
+    vad = cobra if use_vad else None
+
+def on_frame(pcm, position):
+    """Runs on the barge-in worker thread (see capture.FrameWorker) for every frame while the assistant is talking"""
+    global voiced_frames
+
+    if interrupted.is_set() or time.perf_counter() - listening_since < ignore_time:
+        return
+
+    if wake_word is not None and wake_word.process(pcm) >= 0:
+        interrupt("by_wake_word", position + len(pcm)) # Like a normal wake word, record from right after it
+        return
+
+    if vad is None:
+        return
+    if vad.process(pcm) > voice_threshold:
+        voiced_frames += 1
+    else:
+        voiced_frames = 0
+    if voiced_frames * len(pcm) >= hold_time * capture.sample_rate:
+        interrupt("by_voice", position + len(pcm) - voiced_frames * len(pcm)) # Record from where they started talking
+
+def interrupt(reason, position):
+    global detected_at
+    detected_at = time.perf_counter()
+    stats["interruptions"] += 1
+    stats[reason] += 1
+    capture.mark_wake(position) # So the next recording gets what they said while the assistant was still talking
+    interrupted.set()
+
+def start():
+    """Listen for barge-in. Call when playback starts"""
+    global listening_since
+    global voiced_frames
+    global detected_at
+
+    interrupted.clear()
+    detected_at = None
+    if not enabled or (wake_word is None and vad is None):
+        return
+    listening_since = time.perf_counter()
+    voiced_frames = 0
+    capture.attach_worker(on_frame, "barge_in")
+
+def stop():
+    """Stop listening. Call when playback is done, before anything else attaches to the capture stream"""
+    if capture.listener() is on_frame:
+        capture.detach()
+
+def mark_silent():
+    """streaming.py calls this once the speaker has been stopped after a barge-in"""
+    if detected_at is None:
+        return
+    silent_at = time.perf_counter()
+    stats["last_cancel_to_silence"] = silent_at - detected_at
+    stats["total_cancel_to_silence"] += silent_at - detected_at
+    trace.record("barge_in", detected_at, silent_at)
+
+def report():
+    if not stats["interruptions"]:
+        return "No barge-ins yet"
+    average = stats["total_cancel_to_silence"] / stats["interruptions"] * 1000
+    return (
+        f"Barge-in: {stats['interruptions']} ({stats['by_wake_word']} wake word, {stats['by_voice']} voice), "
+        f"cancel to silence {stats['last_cancel_to_silence'] * 1000:.0f}ms last, {average:.0f}ms on average"
+    )
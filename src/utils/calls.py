@@ -0,0 +1,166 @@
+# Copyright 2026 The Ronny Voice Foundation
+
+"""
+Every Groq and Google request in a turn goes through here, so they all share the same rules:
+
+- The turn has a deadline, and no request gets a timeout past it.
+- Transient errors (timeouts, dropped connections, 429s and 5xx) get retried with exponential backoff and jitter,
+  as long as nothing from the failed attempt was used yet.
+- After a few calls in a row fail (after all their retries) a service's circuit breaker opens, and requests to it fail right away until
+  the cooldown is over, instead of every turn waiting out the same timeouts.
+- Cancelling the turn (or running out of time) stops the LLM stream thread and the TTS request stream.
+"""
+import random
+import threading
+import time
+
+from . import trace
+
+# Settings
+turn_budget = 20 # Seconds from the end of the question until every request for the answer has to be done
+max_attempts = 3
+base_delay = 0.2 # Seconds before the first retry, doubling every time after
+max_delay = 2
+breaker_threshold = 3 # Calls in a row that failed every attempt before a service's circuit breaker opens
+breaker_cooldown = 30 # Seconds it stays open before letting one request through to try again
+
+transient_names = { # Exception class names, so this doesn't have to import groq or google
+    "APIConnectionError", "APITimeoutError", "RateLimitError", "InternalServerError", # Groq
+    "ServiceUnavailable", "DeadlineExceeded", "TooManyRequests", "ResourceExhausted", "GatewayTimeout", # Google
+    "ReadTimeout", "ConnectTimeout", "RemoteProtocolError", "ReadError", "ConnectError", # httpx, mid-stream
+    "TimeoutError", "ConnectionError",
+}
+
+class CircuitOpen(Exception):
+    """The service failed too many times in a row, so this request wasn't even tried"""
+
+class TurnExpired(Exception):
+    """The turn ran out of time (or got cancelled) before this request could start"""
+
+class Deadline:
+    """How long a turn has left. Cancelling it stops everything that checks it"""
+    def __init__(self, seconds):
+        self.ends = time.monotonic() + seconds
+        self.cancelled = threading.Event()
+
+    def remaining(self):
+        if self.cancelled.is_set():
+            return 0
+        return max(self.ends - time.monotonic(), 0)
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def cancel(self):
+        self.cancelled.set()
+
+turn = Deadline(float("inf")) # No deadline between turns, like while recording
+breakers = {} # service -> {"failures", "opened_at"}
+stats = {} # service -> {"calls", "retries", "timeouts", "failures", "fast_fails", "breaker_opens"}
+
+def begin_turn(budget=turn_budget):
+    """Start the clock on a turn. Call once the question is recorded"""
+    global turn
+    turn = Deadline(budget)
+    return turn
+
+def end_turn():
+    global turn
+    turn = Deadline(float("inf"))
+
+def stat(service, key):
+    counts = stats.setdefault(service, {"calls": 0, "retries": 0, "timeouts": 0, "failures": 0, "fast_fails": 0, "breaker_opens": 0})
+    counts[key] += 1
+
+def is_transient(e):
+    status = getattr(e, "status_code", None) or getattr(e, "code", None)
+    if isinstance(status, int) and (status in (408, 429) or status >= 500):
+        return True
+    return type(e).__name__ in transient_names
+
+def is_timeout(e):
+    return "Timeout" in type(e).__name__ or type(e).__name__ == "DeadlineExceeded"
+
+def check(service):
+    """Raise CircuitOpen if the breaker is open. After the cooldown, one request gets to try"""
+    breaker = breakers.setdefault(service, {"failures": 0, "opened_at": None})
+    if breaker["opened_at"] is None:
+        return
+    if time.monotonic() - breaker["opened_at"] < breaker_cooldown:
+        stat(service, "fast_fails")
+        raise CircuitOpen(f"{service} failed {breaker['failures']} calls in a row, not trying again for a bit")
+    breaker["opened_at"] = time.monotonic() # Half open: this request tries, everyone else still waits
+
+def succeeded(service):
+    breakers[service] = {"failures": 0, "opened_at": None}
+
+def failed(service, e):
+    """Count a failed request, for the stats"""
+    stat(service, "failures")
+    if is_timeout(e):
+        stat(service, "timeouts")
+
+def gave_up(service, e):
+    """
+    Count a call that failed for good against the breaker, once no matter how many retries it took.
+    Only transient errors count, a 400 means the service is up
+    """
+    if not is_transient(e):
+        return
+    breaker = breakers.setdefault(service, {"failures": 0, "opened_at": None})
+    breaker["failures"] += 1
+    if breaker["failures"] >= breaker_threshold and breaker["opened_at"] is None:
+        breaker["opened_at"] = time.monotonic()
+        stat(service, "breaker_opens")
+        print(f"{service} circuit breaker opened after {breaker['failures']} failed calls")
+
+def timeout_for(timeout):
+    """The timeout for a request, cut short by the turn deadline. Raises TurnExpired if there's no time left"""
+    remaining = turn.remaining()
+    if remaining <= 0:
+        raise TurnExpired("The turn ran out of time")
+    return min(timeout, remaining)
+
+def call(service, function, timeout, retry_if=None):
+    """
+    Make a request with retries, a timeout and the circuit breaker.
+
+    :param function: Gets called with the timeout in seconds and makes the request.
+    :param retry_if: Gets the exception and says if it's safe to retry. Defaults to is_transient.
+        Streams should also say no once any of the response was used.
+    """
+    retry_if = retry_if or is_transient
+    for attempt in range(max_attempts):
+        check(service)
+        request_timeout = timeout_for(timeout)
+        stat(service, "calls")
+        started = time.perf_counter()
+        try:
+            result = function(request_timeout)
+        except Exception as e:
+            failed(service, e)
+            delay = min(base_delay * 2 ** attempt, max_delay) * random.uniform(0.5, 1.5)
+            if attempt == max_attempts - 1 or not retry_if(e) or delay >= turn.remaining():
+                gave_up(service, e)
+                raise
+            stat(service, "retries")
+            trace.record("retry:" + service, started, error=type(e).__name__)
+            print(f"{service} request failed ({type(e).__name__}), retrying in {delay:.2f}s")
+            if turn.cancelled.wait(delay):
+                raise TurnExpired("The turn was cancelled")
+            continue
+        succeeded(service)
+        return result
+
+def with_timeout(client, timeout):
+    """A Groq client with this timeout and its own retries turned off, since call() does the retrying"""
+    if hasattr(client, "with_options"):
+        return client.with_options(timeout=timeout, max_retries=0)
+    return client # The benchmark's stand-in
+
+def report():
+    return [
+        f"{service}: {counts['calls']} requests, {counts['retries']} retries, {counts['timeouts']} timeouts, "
+        f"{counts['failures']} failures, {counts['fast_fails']} failed fast, breaker opened {counts['breaker_opens']} times"
+        for service, counts in stats.items()
+    ]
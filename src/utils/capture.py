@@ -0,0 +1,201 @@
+# Copyright 2026 The Ronny Voice Foundation
+
+"""
+One always-on microphone stream that feeds both the wake word (Porcupine) and the recorder (Cobra).
+The device only gets opened once, and the last few seconds are always kept so nothing said right after the wake word is lost.
+"""
+import numpy as np
+import threading
+import time
+from .ringbuffer import RingBuffer
+
+# Settings
+sample_rate = 16000 # Porcupine and Cobra both need 16000Hz
+channels = 1
+frame_length = 512 # Porcupine and Cobra both take 512 samples per frame
+history_time = 20 # Seconds of audio kept around
+preroll_time = 2 # Seconds before the recorder starts that it still gets, but never from before the wake word ended
+
+stream = None
+ring = None
+consumer = None # Gets called with (pcm, position) for every frame, from the audio callback
+worker = None # The FrameWorker consumer belongs to, if it's one
+replay_from = None # Position to replay from before the next live frame
+last_adc_time = None
+last_block_time = None # time.perf_counter() when the newest block came in, to work out when any position was heard
+
+wake_position = None # Where the last wake word ended, set by the wake word detector
+wake_time = None
+
+stats = {
+    "frames": 0,
+    "overflows": 0, # PortAudio said the input overflowed
+    "dropped_frames": 0, # Gaps in the timestamps, worked out from how long they were
+    "replayed_frames": 0,
+    "lost_preroll_frames": 0, # Asked to replay audio that was already overwritten
+    "worker_lost_frames": 0, # A FrameWorker fell so far behind the audio got overwritten
+    "wake_to_recording": None, # Seconds from wake word detected to the recorder getting its first frame
+}
+
+def callback(indata, frames, time_info, status):
+    """This is called for every audio block. Saves it, then hands it to whoever is listening"""
+    global replay_from
+    global last_adc_time
+    global last_block_time
+
+    if status.input_overflow:
+        stats["overflows"] += 1
+
+    # Work out if any frames went missing since the last block
+    adc_time = time_info.inputBufferAdcTime
+    if last_adc_time is not None and adc_time:
+        missing = round((adc_time - last_adc_time) * sample_rate / frames) - 1
+        if missing > 0:
+            stats["dropped_frames"] += missing
+    last_adc_time = adc_time
+
+    pcm = indata[:, 0] # The stream is int16, so this is a view and not a copy
+    position = ring.position
+    ring.write(pcm)
+    last_block_time = time.perf_counter()
+    stats["frames"] += 1
+
+    listener = consumer
+    if listener is None:
+        return
+
+    if replay_from is not None: # Catch up on what came in before the listener was attached
+        start, replay_from = replay_from, None
+        if start < ring.oldest():
+            stats["lost_preroll_frames"] += (ring.oldest() - start) // frames
+            start = ring.oldest()
+        for frame_start in range(start, position, frames):
+            listener(ring.read(frame_start, frame_start + frames), frame_start)
+            stats["replayed_frames"] += 1
+
+    listener(pcm, position)
+
+class FrameWorker:
+    """
+    Runs listener(pcm, position) on its own thread for every frame, so Porcupine or Cobra never hold up the audio callback.
+    The callback only wakes it up, and it reads every frame since it last ran from the ring buffer, as one batch.
+    """
+    def __init__(self, listener, name, from_position=None):
+        self.listener = listener
+        self.position = ring.position if from_position is None else from_position
+        self.ready = threading.Event()
+        self.running = True
+        threading.Thread(target=self.run, name=name, daemon=True).start()
+
+    def wake(self, pcm, position):
+        """The consumer, on the audio thread. All it does is say there's more"""
+        self.ready.set()
+
+    def run(self):
+        while self.running:
+            self.ready.wait()
+            self.ready.clear()
+            while self.running and self.position + frame_length <= ring.position:
+                if self.position < ring.oldest():
+                    stats["worker_lost_frames"] += (ring.oldest() - self.position) // frame_length
+                    self.position = ring.oldest()
+                self.listener(ring.read(self.position, self.position + frame_length), self.position)
+                self.position += frame_length
+
+    def stop(self):
+        self.running = False
+        self.ready.set()
+
+def start(frames=frame_length, open_stream=True):
+    """
+    Open the microphone. Call once at startup
+
+    :param open_stream: If false, only the buffer is set up and audio has to be fed to callback() by hand (for the benchmark)
+    """
+    global stream
+    global ring
+    global frame_length
+
+    frame_length = frames
+    ring = RingBuffer(int(history_time * sample_rate) // frame_length * frame_length, np.int16)
+    if not open_stream:
+        return
+    import sounddevice as sd # Here so the benchmark runs without PortAudio
+    stream = sd.InputStream(samplerate=sample_rate, channels=channels, dtype='int16', blocksize=frame_length, callback=callback)
+    stream.start()
+
+def stop():
+    global stream
+    if stream:
+        stream.close()
+        stream = None
+
+def attach(listener, from_position=None):
+    """
+    Start sending frames to listener(pcm, position). Only one listener at a time.
+
+    :param from_position: If given, the frames since this position get replayed to the listener first.
+    """
+    global consumer
+    global replay_from
+
+    replay_from = from_position
+    consumer = listener # Set last, so the callback never sees the listener without its replay position
+
+def attach_worker(listener, name, from_position=None):
+    """
+    Like attach, but listener runs on its own thread (see FrameWorker) instead of on the audio thread.
+    Use this for anything heavier than copying the frame
+    """
+    global worker
+
+    detach()
+    worker = FrameWorker(listener, name, from_position)
+    attach(worker.wake)
+
+def listener():
+    """Whatever is getting the frames right now, or None"""
+    return worker.listener if worker is not None else consumer
+
+def detach():
+    global consumer
+    global worker
+
+    consumer = None
+    if worker is not None:
+        worker.stop() # Safe from the worker's own thread, it finishes the frame it's on and stops
+        worker = None
+
+def heard_at(position):
+    """Roughly when the audio at position came in from the microphone, as time.perf_counter()"""
+    return last_block_time - (ring.position - position) / sample_rate
+
+def mark_wake(position):
+    """The wake word detector calls this with the position right after the wake word"""
+    global wake_position
+    global wake_time
+
+    wake_position = position
+    wake_time = time.perf_counter()
+
+def recording_start_position():
+    """
+    Where a new recording should start. Right after a wake word that's the pre-roll, so anything said while the earcon
+    was playing isn't lost. Otherwise (like in the middle of a conversation) it's just now, so the tail end of the TTS isn't picked up.
+    """
+    global wake_position
+
+    if wake_position is None:
+        return ring.position
+
+    start = max(ring.position - int(preroll_time * sample_rate) // frame_length * frame_length, wake_position)
+    wake_position = None
+    return start
+
+def mark_recording_started():
+    """The recorder calls this on its first frame, to measure wake to recording latency"""
+    global wake_time
+
+    if wake_time is not None:
+        stats["wake_to_recording"] = time.perf_counter() - wake_time
+        wake_time = None
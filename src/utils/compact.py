@@ -0,0 +1,69 @@
+# Copyright 2026 The Ronny Voice Foundation
+
+"""
+Turns tool results into short text for the model. A tool result stays in the context (and gets paid for in prompt tokens)
+on every later turn until context.py trims it, so they're kept small: compact JSON, rounded numbers,
+and cut to a token budget from the end instead of wherever the repr happened to stop.
+"""
+import json
+
+from .context import characters_per_token
+
+float_digits = 1 # Nobody needs 72.83999633789062°F read out loud
+
+stats = {} # tool name -> {"calls", "tokens", "saved", "cut"}
+
+def rounded(value):
+    """Plain JSON types all the way down, with floats rounded. Handles numpy scalars and arrays too"""
+    if hasattr(value, "tolist"): # numpy
+        value = value.tolist()
+    if isinstance(value, float):
+        value = round(value, float_digits)
+        return int(value) if value.is_integer() else value
+    if isinstance(value, dict):
+        return {key: rounded(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [rounded(item) for item in value]
+    return value
+
+def dumps(value):
+    if isinstance(value, str): # Already text, like get_datetime's answer
+        return value
+    return json.dumps(rounded(value), separators=(",", ":"), ensure_ascii=False, default=str)
+
+def fit(value, budget):
+    """The shortest encoding, cut down to the budget if needed. Returns (text, whether anything was cut)"""
+    limit = budget * characters_per_token
+    text = dumps(value)
+    if len(text) <= limit:
+        return text, False
+
+    if isinstance(value, (list, tuple)): # Drop whole items from the end, like the last days of a forecast
+        for keep in range(len(value) - 1, 0, -1):
+            shorter = dumps(list(value[:keep]) + [f"{len(value) - keep} more not shown"])
+            if len(shorter) <= limit:
+                return shorter, True
+    return text[:limit - 1] + "…", True
+
+def encode(name, value, budget):
+    """
+    The text to send the model for a tool result.
+
+    :param budget: Most tokens the result can take, estimated the same way as context.py does.
+    """
+    text, cut = fit(value, budget)
+    tokens = len(text) // characters_per_token
+    stat = stats.setdefault(name, {"calls": 0, "tokens": 0, "saved": 0, "cut": 0})
+    stat["calls"] += 1
+    stat["tokens"] += tokens
+    # Compared to str(result), which is what used to be sent: the same data, but with unrounded (numpy) floats and no budget
+    stat["saved"] += max(len(str(value)) // characters_per_token - tokens, 0)
+    stat["cut"] += cut
+    return text
+
+def report():
+    """Tokens each tool's results took and saved compared to str(result), as lines of text"""
+    return [
+        f"{name}: {stat['tokens'] / stat['calls']:.0f} tokens per result, {stat['saved']} saved vs str(), {stat['cut']} cut to budget"
+        for name, stat in stats.items()
+    ]
@@ -0,0 +1,86 @@
+# Copyright 2026 The Ronny Voice Foundation
+
+"""
+Keeps the Groq and Google connections warm, so the first question after a long idle doesn't pay for DNS,
+the TLS handshake and HTTP/2 or gRPC channel setup on top of everything else.
+
+Each client gets a cheap request as a ping: at startup, right after the wake word (while the user is still talking)
+and every so often while idle. Every ping is timed and counted as cold or warm, so report() shows what warming saves.
+"""
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from . import trace
+
+# Settings
+keepalive_interval = 45 # Seconds between pings while idle, under the usual load balancer idle timeout of 60s
+keepalive_expiry = 120 # Seconds httpx keeps an idle Groq connection open (its default is only 5s)
+fresh_time = 15 # A connection pinged this recently is still open, so waking up doesn't ping it again
+cold_after = 60 # A ping this long after the last one probably had to reconnect, so it counts as cold
+ping_history = 100 # Latencies kept per connection and kind, so a long running process doesn't keep every ping forever
+
+pings = {} # name -> function that makes a cheap request
+last_contact = {} # name -> time.monotonic() of the last successful ping
+stats = {} # name -> {"cold": deque of seconds, "warm": deque of seconds, "errors": 0}
+
+executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="warm")
+
+def groq_http_client():
+    """An httpx client for Groq that keeps its connection around between turns"""
+    import httpx
+    from groq import DefaultHttpxClient
+    return DefaultHttpxClient(limits=httpx.Limits(max_connections=10, max_keepalive_connections=4, keepalive_expiry=keepalive_expiry))
+
+def register(name, ping):
+    pings[name] = ping
+    stats.setdefault(name, {"cold": deque(maxlen=ping_history), "warm": deque(maxlen=ping_history), "errors": 0})
+
+def register_groq(client):
+    register("groq", client.models.list)
+
+def register_google(client):
+    register("google", lambda: client.list_voices(language_code="en-US"))
+
+def ping(name):
+    """Ping one connection. Returns the seconds it took, or None if it failed"""
+    previous = last_contact.get(name)
+    cold = previous is None or time.monotonic() - previous > cold_after
+    started = time.perf_counter()
+    try:
+        pings[name]()
+    except Exception as e: # Offline or the service is having a moment, the real request will find out soon enough
+        stats[name]["errors"] += 1
+        print(f"Couldn't warm the {name} connection: {e}")
+        return None
+
+    elapsed = time.perf_counter() - started
+    last_contact[name] = time.monotonic()
+    stats[name]["cold" if cold else "warm"].append(elapsed)
+    trace.record("warm:" + name, started, cold=cold)
+    return elapsed
+
+def is_fresh(name):
+    return name in last_contact and time.monotonic() - last_contact[name] < fresh_time
+
+def warm():
+    """Ping every connection that hasn't been used lately, in the background. Call right after the wake word"""
+    return [executor.submit(ping, name) for name in pings if not is_fresh(name)]
+
+def keep_alive():
+    """Ping everything, one at a time. Runs as an idle task"""
+    for name in pings:
+        ping(name)
+
+def report():
+    """Cold vs warm ping latency for each connection (the last ping_history of each), as lines of text"""
+    lines = []
+    for name, counts in stats.items():
+        parts = []
+        for kind in ("cold", "warm"):
+            if counts[kind]:
+                parts.append(f"{kind} p50 {trace.percentile(counts[kind], 0.5) * 1000:.0f}ms ({len(counts[kind])})")
+        if counts["errors"]:
+            parts.append(f"{counts['errors']} errors")
+        lines.append(f"{name}: " + (", ".join(parts) or "not pinged yet"))
+    return lines
@@ -0,0 +1,102 @@
+# Copyright 2026 The Ronny Voice Foundation
+
+"""
+Keeps the conversation under a token budget, so the prompt (and Groq's time to first token) doesn't keep growing.
+Whole turns get dropped, oldest first, so a tool result is never cut off from the assistant message that asked for it.
+"""
+import json
+
+from . import calls
+
+# Settings
+token_budget = 1500 # Estimated tokens for the conversation, not counting the system prompt
+characters_per_token = 4 # Rough, but close enough for English and it's basically free to work out
+message_overhead = 4 # Tokens each message costs on top of its content (role and such)
+summarize = False # Fold dropped turns into a short summary instead of forgetting them. Costs a small Groq request while idle
+summary_model = 'llama-3.1-8b-instant'
+summary_words = 60
+summary_timeout = 10 # Seconds. It's idle time anyway
+
+def estimate_tokens(message):
+    """Estimated tokens for one message, including any tool calls it made"""
+    characters = len(message.get("content") or "")
+    for tool_call in message.get("tool_calls") or []:
+        characters += len(tool_call["function"]["name"]) + len(tool_call["function"]["arguments"] or "")
+    return characters // characters_per_token + message_overhead
+
+class ContextWindow(list):
+    """
+    The messages of the conversation, in the same format Groq wants (so it can be passed around like a normal list).
+    Call trim() after adding to it.
+    """
+    def __init__(self):
+        super().__init__()
+        self.summary_message = None # Always at index 0 when there is one
+        self.dropped = [] # Turns that were trimmed off but haven't been summarized yet
+        self.stats = {"trimmed_turns": 0, "summaries": 0, "tokens": 0}
+
+    def turns(self):
+        """Split the messages into turns, each starting at a user message. Returns (start, end) indexes"""
+        first = 1 if self.summary_message is not None else 0
+        starts = [i for i in range(first, len(self)) if self[i]["role"] == "user"] or [first]
+        if starts[0] != first: # Something before the first user message, keep it with the first turn
+            starts[0] = first
+        return list(zip(starts, starts[1:] + [len(self)]))
+
+    def tokens(self):
+        return sum(estimate_tokens(message) for message in self)
+
+    def trim(self):
+        """Drop the oldest turns until it fits in the budget. The newest turn always stays, even if it's over by itself"""
+        total = self.tokens()
+        turns = self.turns()
+
+        drop_until = None
+        for start, end in turns[:-1]:
+            if total <= token_budget:
+                break
+            total -= sum(estimate_tokens(message) for message in self[start:end])
+            drop_until = end
+
+        if drop_until is not None:
+            first = turns[0][0]
+            dropped = self[first:drop_until]
+            del self[first:drop_until]
+            self.stats["trimmed_turns"] += sum(1 for start, end in turns if end <= drop_until)
+            if summarize:
+                self.dropped += dropped
+
+        self.stats["tokens"] = self.tokens()
+
+    def refresh_summary(self, client):
+        """
+        Fold the dropped turns into the running summary with a small, fast model.
+        Only does anything if turns were dropped since the last time, so this is cheap to run as an idle task.
+        """
+        if not self.dropped:
+            return
+        dropped, self.dropped = self.dropped, []
+
+        transcript = "\n".join(
+            f"{message['role']}: {message.get('content') or json.dumps(message.get('tool_calls'))}"
+            for message in dropped
+        )
+        previous = self.summary_message["content"] if self.summary_message else ""
+        completion = calls.call("groq", lambda timeout: calls.with_timeout(client, timeout).chat.completions.create(
+            model=summary_model,
+            messages=[{
+                'role': 'user',
+                'content': f"Summarize this conversation between a user and a voice assistant in under {summary_words} words. "
+                           f"Keep names, numbers and anything the user asked to remember.\n\n{previous}\n{transcript}",
+            }],
+            temperature=0.2,
+            max_completion_tokens=summary_words * 2,
+        ), summary_timeout)
+
+        message = {'role': 'system', 'content': "Earlier in this conversation: " + completion.choices[0].message.content}
+        if self.summary_message is not None:
+            self[0] = message
+        else:
+            self.insert(0, message)
+        self.summary_message = message
+        self.stats["summaries"] += 1
@@ -0,0 +1,74 @@
+# Copyright 2026 The Ronny Voice Foundation
+
+"""
+The little start/end listening sounds. They're decoded once at startup and played in the background,
+so nothing has to wait on reading a file or on the sound finishing.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from math import gcd
+from pathlib import Path
+from typing import Any, cast # For casting the sounddevice's output device to a dict
+
+import numpy as np
+import soundfile as sf
+
+from . import trace
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+names = ["start_listening", "end_listening"]
+
+sounds = {} # name -> float32 audio at output_rate, ready to play
+load_times = {} # name -> seconds it took to read and decode, which every turn used to pay
+output_rate = None
+player = ThreadPoolExecutor(max_workers=1, thread_name_prefix="earcon") # One at a time so they don't cut each other off
+
+stats = {
+    "played": 0,
+    "saved_seconds": 0.0, # Decode time plus sound length that used to be in series with everything else
+}
+
+def load():
+    """Read and decode all the sounds at the output device's rate. Call once at startup"""
+    global output_rate
+
+    try:
+        import sounddevice as sd # Here so a machine without PortAudio (like for the benchmarks) can still import this
+        device_info = cast(dict[str, Any], sd.query_devices(kind='output'))
+        output_rate = int(device_info['default_samplerate'])
+    except Exception:
+        output_rate = 44100
+        print(f"Unable to find sample rate of output device! Using default ({output_rate})")
+
+    for name in names:
+        path = BASE_DIR / "sfx" / f"{name}.wav"
+        if not path.exists():
+            print(f"Listening sfx not found! Skipping..: {path.parent}")
+            continue
+
+        started = time.perf_counter()
+        data, rate = sf.read(str(path), dtype='float32')
+        load_times[name] = time.perf_counter() - started
+
+        if rate != output_rate: # Resample now so the device doesn't have to every time
+            from scipy.signal import resample_poly
+            divisor = gcd(output_rate, rate)
+            data = resample_poly(data, output_rate // divisor, rate // divisor, axis=0).astype(np.float32)
+        sounds[name] = data
+
+def play_blocking(name, data):
+    import sounddevice as sd
+
+    with trace.span("earcon", sound=name):
+        sd.play(data, output_rate)
+        sd.wait()
+
+def play(name):
+    """Start playing a sound and return right away"""
+    data = sounds.get(name)
+    if data is None:
+        return
+
+    player.submit(play_blocking, name, data)
+    stats["played"] += 1
+    stats["saved_seconds"] += load_times.get(name, 0) + len(data) / output_rate
@@ -0,0 +1,251 @@
+# Copyright 2026 The Ronny Voice Foundation
+
+"""
+Hedged TTS: Google does the talking, but if its first audio is late the local engine (pyttsx3, see legacy/system_tts.py)
+starts on the first phrase too, and whichever is ready first gets played. If the local one wins, a second Google stream
+picks up from the second phrase, so the switch back happens at a phrase boundary. If Google fails outright,
+the local engine says the rest of the answer.
+"""
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from math import gcd
+
+import numpy as np
+
+from . import calls, trace
+
+# Settings
+enabled = True
+first_audio_deadline = 0.7 # Seconds from the first phrase being ready until Google's audio has to show up, or the local engine starts too
+characters_per_second = 30 # Roughly how fast Google talks at speaking_rate 2, to work out which phrases it already said before failing
+poll_interval = 0.01
+
+local_available = None # Whether the local engine could start, None until the first time it's needed
+
+stats = {
+    "answers": 0,
+    "hedges": 0, # Google was late and the local engine started on the first phrase
+    "local_won": 0, # ...and finished first, so it got played
+    "cloud_won": 0, # ...but Google came through first anyway
+    "fallbacks": 0, # Google failed and the local engine said the rest
+    "saved_seconds": 0.0, # How much sooner the first audio was when the local engine won
+}
+
+executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="local_tts") # pyttsx3 isn't thread safe
+
+def render(text, sample_rate):
+    """Say text with the local engine, as int16 bytes at sample_rate. Runs on the executor"""
+    global local_available
+
+    try:
+        from .legacy import system_tts # Starting the engine takes a moment, so only when it's actually needed
+    except Exception: # Like no eSpeak on the Pi. It fails the same way every time, so don't keep trying
+        local_available = False
+        raise
+    local_available = True
+
+    audio, rate = system_tts.render(re.sub(r"\[[^\]]*\]", " ", text)) # It would read markup like [pause short] out loud
+    if rate != sample_rate:
+        from scipy.signal import resample_poly
+        divisor = gcd(sample_rate, rate)
+        audio = resample_poly(audio, sample_rate // divisor, rate // divisor).clip(-32768, 32767).astype(np.int16)
+    return audio.tobytes()
+
+class CloudStream:
+    """One Google stream, read on its own thread into a queue so it can be raced against the local engine"""
+    def __init__(self, open_stream, start):
+        self.start = start # Index of the first phrase in this stream
+        self.open_stream = open_stream
+        self.responses = None
+        self.chunks = queue.Queue() # Audio bytes, then None at the end or the exception if it failed
+        self.first_audio = None
+        self.received = 0 # Bytes of audio
+        self.cancelled = False
+        self.stop_after_first = False # Only kept going to measure when its first audio would have come
+        self.stop_sending = threading.Event() # Set once nothing else it says will get played, so no more phrases go to it
+        threading.Thread(target=self.read, name="tts_receiver", daemon=True).start()
+
+    def read(self):
+        try:
+            self.responses = self.open_stream(self.start, self.stop_sending) # Here so a circuit breaker error ends up in chunks like any other
+            if self.cancelled:
+                self.cancel()
+            for response in self.responses:
+                if self.first_audio is None:
+                    self.first_audio = time.perf_counter()
+                if self.stop_after_first:
+                    self.cancel()
+                    return
+                self.chunks.put(response.audio_content)
+        except Exception as e:
+            if self.cancelled:
+                self.chunks.put(None)
+                return
+            if not isinstance(e, calls.CircuitOpen):
+                calls.failed("google", e)
+                calls.gave_up("google", e) # Nothing retries a stream once it's going
+            self.chunks.put(e)
+        else:
+            calls.succeeded("google")
+            self.chunks.put(None)
+
+    def cancel(self):
+        self.cancelled = True
+        if self.responses is not None:
+            getattr(self.responses, "cancel", lambda: None)()
+
+class HedgedSpeech:
+    """
+    Speaks one answer into a playback.Player. run() it on its own thread, cancel() it on a barge-in.
+
+    :param open_stream: Gets called with the index of the first phrase and an Event, and returns Google's response
+        iterator for the phrases from there on. Once the Event is set, it should stop sending phrases
+    """
+    def __init__(self, open_stream, phrase_list, player, sample_rate):
+        self.open_stream = open_stream
+        self.phrases = phrase_list
+        self.player = player
+        self.sample_rate = sample_rate
+        self.streams = []
+        self.first_audio = None # time.perf_counter() when the first audio (from either engine) was ready to play
+        self.error = None # Only set if the local engine couldn't save the day either
+
+    def stream(self, start):
+        cloud = CloudStream(self.open_stream, start)
+        self.streams.append(cloud)
+        return cloud
+
+    def feed(self, audio):
+        if self.first_audio is None:
+            self.first_audio = time.perf_counter()
+        return self.player.feed(audio)
+
+    def cancel(self):
+        for cloud in self.streams:
+            cloud.cancel()
+
+    def run(self):
+        stats["answers"] += 1
+        try:
+            cloud = self.stream(0)
+            if not enabled or local_available is False or not self.phrases.wait_first():
+                self.drain(cloud, local_works=local_available is not False)
+                return
+
+            try:
+                chunk = cloud.chunks.get(timeout=max(self.phrases.first_at + first_audio_deadline - time.perf_counter(), 0))
+            except queue.Empty:
+                self.hedge(cloud)
+                return
+
+            if chunk is None or isinstance(chunk, Exception):
+                cloud.chunks.put(chunk) # Let drain() deal with it
+            else:
+                cloud.received += len(chunk)
+                if not self.feed(chunk):
+                    return
+            self.drain(cloud)
+        finally:
+            self.player.finish()
+
+    def hedge(self, cloud):
+        """Google is late with the first phrase. Race it against the local engine"""
+        stats["hedges"] += 1
+        started = time.perf_counter()
+        local = executor.submit(render, self.phrases.items[0], self.sample_rate)
+        rest = self.stream(1) # So Google is already working on what comes after the first phrase
+
+        while True:
+            try:
+                chunk = cloud.chunks.get(timeout=poll_interval)
+            except queue.Empty:
+                chunk = False
+            if cloud.cancelled: # Barged in, nobody's listening to whichever would have won
+                trace.record("tts_hedge", started, winner=None)
+                return
+            if chunk is False and not local.done():
+                continue
+
+            if chunk and not isinstance(chunk, Exception): # Google came through first, carry on like nothing happened
+                stats["cloud_won"] += 1
+                trace.record("tts_hedge", started, winner="cloud")
+                rest.cancel()
+                cloud.received += len(chunk)
+                if self.feed(chunk):
+                    self.drain(cloud)
+                return
+
+            try:
+                audio = local.result()
+            except Exception as e: # No local engine either, just keep waiting on Google
+                print(f"Local TTS failed: {e}")
+                rest.cancel()
+                if chunk is not False:
+                    cloud.chunks.put(chunk)
+                self.drain(cloud, local_works=False)
+                return
+
+            stats["local_won"] += 1
+            trace.record("tts_hedge", started, winner="local")
+            cloud.stop_after_first = True # Keep it going just long enough to see how much was saved
+            cloud.stop_sending.set() # The first phrase is all it needs for that, rest has everything after it
+            if isinstance(chunk, Exception) or chunk is None:
+                cloud.cancel()
+            if self.feed(audio):
+                self.drain(rest)
+            if cloud.first_audio is not None:
+                stats["saved_seconds"] += max(cloud.first_audio - self.first_audio, 0)
+            return
+
+    def drain(self, cloud, local_works=True):
+        """Play everything from this stream. If it fails, the local engine says whatever it didn't get to"""
+        while True:
+            chunk = cloud.chunks.get()
+            if chunk is None:
+                return
+            if isinstance(chunk, Exception):
+                if not local_works:
+                    self.error = chunk
+                    return
+                print(f"Google TTS failed, switching to the local voice: {chunk}")
+                self.fallback(cloud.start + self.phrases_said(cloud), chunk)
+                return
+            cloud.received += len(chunk)
+            if not self.feed(chunk):
+                return
+
+    def phrases_said(self, cloud):
+        """Roughly how many whole phrases a stream got through, from how much audio it sent"""
+        said = cloud.received / 2 / self.sample_rate
+        count = 0
+        for phrase in self.phrases.items[cloud.start:]:
+            said -= len(phrase) / characters_per_second
+            if said < 0:
+                break
+            count += 1
+        return count
+
+    def fallback(self, start, error):
+        stats["fallbacks"] += 1
+        for phrase in self.phrases.read(start):
+            if not phrase:
+                continue
+            try:
+                audio = executor.submit(render, phrase, self.sample_rate).result()
+            except Exception as e:
+                print(f"Local TTS failed too: {e}")
+                self.error = error
+                return
+            if not self.feed(audio):
+                return
+
+def report():
+    if not stats["hedges"] and not stats["fallbacks"]:
+        return f"TTS hedge: never needed in {stats['answers']} answers"
+    return (
+        f"TTS hedge: fired {stats['hedges']}/{stats['answers']} ({stats['local_won']} local won, {stats['cloud_won']} Google won), "
+        f"{stats['fallbacks']} fallbacks, saved {stats['saved_seconds']:.2f}s"
+    )
@@ -0,0 +1,57 @@
+# Copyright 2026 The Ronny Voice Foundation
+
+"""
+Background jobs (warming connections, refreshing caches, flushing logs...) that run while waiting for the wake word.
+They run one at a time on their own low priority thread so they don't get in the way of wake word detection.
+"""
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Settings
+check_interval = 1 # Seconds between checking if anything is due
+niceness = 10 # How much to lower the priority of the background thread (Linux only)
+
+is_idle = False # main.py sets this while waiting for the wake word
+tasks = [] # [name, function, interval in seconds, next time it's due]
+stats = {} # name -> {"runs", "errors", "last_duration"}
+
+def lower_priority():
+    try:
+        os.setpriority(os.PRIO_PROCESS, 0, niceness) # On Linux this only applies to the calling thread
+    except (AttributeError, OSError):
+        pass # Not supported here, it'll just run at normal priority
+
+executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="idle", initializer=lower_priority)
+
+def register(name, function, interval, run_now=True):
+    """
+    Run function every `interval` seconds while idle.
+
+    :param run_now: If true, it runs the first time the assistant is idle instead of waiting a whole interval
+    """
+    tasks.append([name, function, interval, 0 if run_now else time.monotonic() + interval])
+    stats[name] = {"runs": 0, "errors": 0, "last_duration": None}
+
+def run_task(name, function):
+    started = time.perf_counter()
+    try:
+        function()
+    except Exception as e:
+        stats[name]["errors"] += 1
+        print(f"Idle task {name} failed: {e}")
+    stats[name]["runs"] += 1
+    stats[name]["last_duration"] = time.perf_counter() - started
+
+async def run():
+    """Runs forever, start it with asyncio.create_task"""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(check_interval)
+        for task in tasks:
+            name, function, interval, due = task
+            if not is_idle or time.monotonic() < due:
+                continue
+            await loop.run_in_executor(executor, run_task, name, function)
+            task[3] = time.monotonic() + interval
@@ -0,0 +1,130 @@
+# Copyright 2026 The Ronny Voice Foundation
+
+"""
+Answers simple questions (time, date, basic math, current weather) straight from the tools, without the LLM.
+Only questions that match a pattern completely get answered here, anything else (like "what time is it in Tokyo") goes to the LLM.
+"""
+import re
+import time
+
+from . import trace
+
+enabled = True
+
+number_words = {
+    "zero": 0, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10,
+    "eleven": 11, "twelve": 12, "thirteen": 13, "fourteen": 14, "fifteen": 15, "sixteen": 16, "seventeen": 17,
+    "eighteen": 18, "nineteen": 19, "twenty": 20, "hundred": 100,
+}
+operators = {
+    "plus": "+", "+": "+", # Not "and", "what is 5 and 3" might not be a sum at all
+    "minus": "-", "-": "-",
+    "times": "*", "multiplied by": "*", "x": "*", "*": "*",
+    "divided by": "/", "over": "/", "/": "/",
+}
+# The LLM would have needed a tool call request and then a second request to answer
+round_trips_per_hit = 2
+
+number = r"(-?\d+(?:\.\d+)?|" + "|".join(number_words) + r")"
+patterns = {
+    "time": re.compile(r"(?:hey )?(?:what(?:s| is) the time|what time is it)(?: right now| now)?"),
+    "date": re.compile(r"(?:hey )?(?:what(?:s| is) (?:the date|todays date)|what day is (?:it|today))(?: today)?"),
+    "calculate": re.compile(
+        r"(?:what(?:s| is)|calculate|how much is) " + number + r" (" + "|".join(map(re.escape, operators)) + r") " + number
+    ),
+    "weather": re.compile(r"(?:hey )?(?:whats|what is|hows|how is) the weather(?: like)?(?: right now| now| outside)?"),
+}
+
+stats = {
+    "hits": 0,
+    "misses": 0,
+    "hit_time": 0.0, # Total seconds spent answering hits
+    "by_intent": {},
+}
+
+def normalize(question):
+    """Lowercase, no punctuation except math symbols, and no extra spaces"""
+    question = question.lower().replace("'", "").replace("’", "")
+    question = re.sub(r"[^a-z0-9+*/.\- ]", " ", question)
+    question = re.sub(r"(?<!\d)\.|\.(?!\d)", " ", question) # Periods, but not decimal points
+    return " ".join(question.split())
+
+def to_number(text):
+    return float(number_words.get(text, text))
+
+def format_number(value):
+    value = float(value)
+    return str(int(value)) if value.is_integer() else f"{value:.4g}"
+
+def answer_time(match):
+    from .tools import dt
+    return f"It's {dt.now().strftime('%-I:%M %p')}."
+
+def answer_date(match):
+    from .tools import dt
+    return f"Today is {dt.now().strftime('%A, %B %-d')}."
+
+def answer_calculate(match):
+    from .tools import calculate
+    left, operator, right = match.groups()
+    result = calculate.calculate(f"{to_number(left)} {operators[operator]} {to_number(right)}")
+    if result.startswith("Error"):
+        return None # Let the LLM explain it
+    return f"{left} {operator} {right} is {format_number(result)}."
+
+def answer_weather(match):
+    from .tools import weather
+    current = weather.current_conditions()
+    description = weather.describe(current["weather_code"])
+    answer = f"It's {round(current['temperature'])} degrees"
+    return answer + (f" and {description} right now." if description else " right now.")
+
+answers = {
+    "time": answer_time,
+    "date": answer_date,
+    "calculate": answer_calculate,
+    "weather": answer_weather,
+}
+
+def match(question):
+    """
+    Try to answer a question without the LLM.
+
+    :return: The answer to speak, or None if the LLM should handle it.
+    """
+    if not enabled:
+        return None
+
+    started = time.perf_counter()
+    normalized = normalize(question)
+    for name, pattern in patterns.items():
+        found = pattern.fullmatch(normalized)
+        if not found:
+            continue
+        try:
+            answer = answers[name](found)
+        except Exception as e: # Tool broke, the LLM can try instead
+            print(f"Fast path for {name} had an error: {e}")
+            answer = None
+        if answer is None:
+            break
+
+        stats["hits"] += 1
+        stats["hit_time"] += time.perf_counter() - started
+        stats["by_intent"][name] = stats["by_intent"].get(name, 0) + 1
+        trace.record("intent", started, intent=name)
+        return answer
+
+    stats["misses"] += 1
+    return None
+
+def report():
+    """How often the fast path answered and how much it saved"""
+    total = stats["hits"] + stats["misses"]
+    if not total:
+        return "No questions yet"
+    average = stats["hit_time"] / stats["hits"] * 1000 if stats["hits"] else 0
+    return (
+        f"Fast path answered {stats['hits']}/{total} ({stats['hits'] / total:.0%}), "
+        f"{average:.0f}ms on average, saving {stats['hits'] * round_trips_per_hit} Groq round trips"
+    )
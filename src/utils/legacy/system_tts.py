@@ -1,6 +1,10 @@
 # Copyright 2026 The Ronny Voice Foundation
 
+import os
+import tempfile
+
 import pyttsx3
+import soundfile as sf
 
 engine = pyttsx3.init()
 
@@ -11,4 +15,19 @@ def speak(text):
     :param text: The words to speak
     """
     engine.say(text)
-    engine.runAndWait()
\ No newline at end of file
+    engine.runAndWait()
+
+def render(text):
+    """
+    Run the local TTS engine into audio instead of the speakers.
+
+    :return: The int16 samples and their sample rate
+    """
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "speech.wav")
+        engine.save_to_file(text, path)
+        engine.runAndWait()
+        audio, rate = sf.read(path, dtype='int16')
+    if audio.ndim > 1:
+        audio = audio[:, 0]
+    return audio, rate
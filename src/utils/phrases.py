@@ -0,0 +1,175 @@
+# Copyright 2026 The Ronny Voice Foundation
+
+"""
+Groups the tiny deltas coming out of the LLM into phrase-sized chunks before they go to TTS.
+Fewer, bigger messages means less gRPC overhead and way better prosody.
+"""
+import queue
+import threading
+import time
+
+# Settings
+sentence_endings = ".!?\n" # Always flush after these
+clause_endings = ",;:" # Only flush after these if the chunk is already long enough
+min_clause_length = 24 # Characters before a comma is allowed to end a chunk
+max_chunk_length = 180 # Hard cap, flushed at the last space
+max_wait = 0.35 # Seconds a partial chunk can sit in the buffer before it gets flushed anyway, up to its last whole word
+first_max_wait = 0.15 # Tighter deadline for the first chunk so first audio doesn't get any later
+
+stats = {
+    "deltas": 0, # Everything that came off the queue (not counting the None at the end)
+    "empty_deltas": 0, # Dropped, these used to be sent as their own message
+    "messages_sent": 0, # Text requests actually sent to Google, across every stream, including keepalives. Counted in streaming.py
+    "keepalives": 0, # Empty ones, also counted in streaming.py
+    "first_delta_latency": None, # Seconds from turn start to the first non-empty delta
+    "first_chunk_latency": None, # Seconds from turn start to the first flushed chunk
+}
+
+def reset_stats():
+    for key in stats:
+        stats[key] = None if key.endswith("latency") else 0
+
+def find_boundary(buffer):
+    """
+    Find where the buffer can be cut, or None if it should keep waiting.
+    The cut goes after the whitespace that follows the punctuation so words don't get glued together.
+
+    :param buffer: The text that hasn't been sent yet
+    """
+    cut = None
+    depth = 0 # Don't split inside markup like [pause short]
+
+    for i, char in enumerate(buffer):
+        if char == "[":
+            depth += 1
+        elif char == "]":
+            depth = max(depth - 1, 0)
+        elif depth == 0 and i + 1 < len(buffer) and buffer[i + 1].isspace():
+            if char in sentence_endings or (char in clause_endings and i + 1 >= min_clause_length):
+                cut = i + 2
+                break
+
+    if cut is None and len(buffer) > max_chunk_length:
+        cut = split_at_space(buffer) or len(buffer) # Way too long without a space, it has to go some time
+    return cut
+
+def split_at_space(buffer):
+    """Cut after the last space so a word isn't chopped in half. None if there's nowhere to cut yet."""
+    end = len(buffer)
+    if buffer.rfind("[") > buffer.rfind("]"): # Unfinished markup, keep it together for the next chunk
+        end = buffer.rfind("[")
+    space = buffer.rfind(" ", 0, end)
+    if space > 0:
+        return space + 1
+    if 0 < end < len(buffer): # Right before the markup is a fine place too
+        return end
+    return None
+
+def coalesce(text_queue, started_at=None, keepalive=3):
+    """
+    Read deltas off the queue until a None shows up, yielding phrase-sized chunks.
+    Yields "" if nothing came in for `keepalive` seconds so the TTS stream doesn't time out.
+
+    :param text_queue: The queue the LLM thread is putting deltas on.
+    :param started_at: time.perf_counter() at the start of the turn, for the latency counters.
+    :param keepalive: Seconds of silence before sending an empty message.
+    """
+    reset_stats()
+    started_at = started_at or time.perf_counter()
+    buffer = ""
+    buffer_started = 0.0
+
+    def sent(chunk):
+        if chunk and stats["first_chunk_latency"] is None:
+            stats["first_chunk_latency"] = time.perf_counter() - started_at
+        return chunk
+
+    while True:
+        wait = first_max_wait if stats["first_chunk_latency"] is None else max_wait
+        timeout = max(buffer_started + wait - time.perf_counter(), 0) if buffer else keepalive
+        try:
+            data = text_queue.get(timeout=timeout)
+        except queue.Empty:
+            if buffer: # Deadline hit, send what we've got up to the last whole word
+                cut = split_at_space(buffer)
+                buffer_started = time.perf_counter()
+                if cut is None: # Still in the middle of the first word, half of it would sound wrong
+                    continue
+                chunk, buffer = buffer[:cut], buffer[cut:]
+                yield sent(chunk)
+            else:
+                yield sent("")
+            continue
+
+        if data is None:
+            if buffer.strip():
+                yield sent(buffer)
+            return
+
+        stats["deltas"] += 1
+        if not data:
+            stats["empty_deltas"] += 1
+            continue
+
+        if stats["first_delta_latency"] is None:
+            stats["first_delta_latency"] = time.perf_counter() - started_at
+        if not buffer:
+            buffer_started = time.perf_counter()
+        buffer += data
+
+        while (cut := find_boundary(buffer)) is not None:
+            chunk, buffer = buffer[:cut], buffer[cut:]
+            buffer_started = time.perf_counter()
+            yield sent(chunk)
+
+class PhraseList:
+    """
+    Keeps every phrase of an answer, so more than one TTS engine can read them (see hedge.py),
+    each from wherever it needs to start.
+    """
+    def __init__(self):
+        self.items = []
+        self.done = False
+        self.first_at = None # time.perf_counter() when the first phrase came in
+        self.changed = threading.Condition()
+
+    def collect(self, chunks):
+        """Save the phrases from coalesce() as they come. Run it on its own thread"""
+        try:
+            for chunk in chunks:
+                if not chunk: # Keepalives are up to each reader
+                    continue
+                with self.changed:
+                    self.items.append(chunk)
+                    if self.first_at is None:
+                        self.first_at = time.perf_counter()
+                    self.changed.notify_all()
+        finally:
+            with self.changed:
+                self.done = True
+                self.changed.notify_all()
+
+    def wait_first(self):
+        """Block until the first phrase is in. Returns False if the answer ended without any"""
+        with self.changed:
+            self.changed.wait_for(lambda: self.items or self.done)
+            return bool(self.items)
+
+    def read(self, start=0, keepalive=3):
+        """
+        Yield the phrases from index start on, as they come in.
+        Yields "" if nothing new came in for `keepalive` seconds so a TTS stream doesn't time out.
+        """
+        index = start
+        while True:
+            with self.changed:
+                if index >= len(self.items) and not self.done:
+                    self.changed.wait(keepalive)
+                if index < len(self.items):
+                    item = self.items[index]
+                    index += 1
+                elif self.done:
+                    return
+                else:
+                    item = ""
+            yield item
@@ -0,0 +1,137 @@
+# Copyright 2026 The Ronny Voice Foundation
+
+"""
+Plays streamed TTS audio smoothly. A receiver thread puts the audio from Google into a jitter buffer and the sound card
+takes it out from its own callback, so a slow chunk from gRPC doesn't become a gap (as long as the buffer has some left),
+and the speaker never holds up reading from gRPC (until the buffer is full).
+
+Playback only starts once prebuffer_time is buffered. More is smoother on a bad connection, less gets to the first sound sooner.
+"""
+import threading
+import time
+
+import numpy as np
+
+from .ringbuffer import RingBuffer
+
+# Settings
+prebuffer_time = 0.15 # Seconds of audio buffered before playback starts
+rebuffer_time = 0.1 # Seconds buffered again after running dry, before playback picks back up
+max_buffer_time = 30 # Seconds the jitter buffer holds. The receiver waits if it fills up
+block_time = 0.02 # Seconds of audio per callback
+depth_history = 2000 # How many buffer depth samples to keep, one per callback (40s at 20ms)
+
+class Player:
+    """
+    Plays one answer. feed() it audio from any thread, finish() once there's no more, then wait() for it to play out.
+
+    :param open_stream: Gets called with (callback, blocksize) and returns an output stream that isn't started yet.
+        The callback has the same signature as sounddevice's RawOutputStream callback
+    """
+    def __init__(self, sample_rate, open_stream):
+        self.sample_rate = sample_rate
+        self.buffer = RingBuffer(int(max_buffer_time * sample_rate), np.int16)
+        self.depths = RingBuffer(depth_history, np.float32) # Seconds buffered at every callback
+        self.read_position = 0
+        self.leftover = b"" # Odd byte from the end of a chunk, since chunks aren't always split on a sample
+        self.threshold = int(prebuffer_time * sample_rate)
+        self.buffering = True
+        self.finished = False # No more audio is coming
+        self.aborted = False
+        self.done = threading.Event()
+        self.started_at = time.perf_counter()
+        self.first_sound = None # perf_counter() of the first callback that played real audio
+        self.stats = {"underruns": 0, "device_underflows": 0, "callbacks": 0, "full_waits": 0}
+        self.stream = open_stream(self.callback, int(block_time * sample_rate))
+
+    def __enter__(self):
+        self.stream.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self.aborted or exc[0] is not None:
+            self.abort()
+        else:
+            self.stream.stop() # Everything's already been handed to the sound card by now
+        self.stream.close()
+        return False
+
+    def feed(self, audio):
+        """
+        Add audio (int16 bytes). Only waits if the buffer is full.
+
+        :return: False if playback was aborted, so the receiver can stop
+        """
+        audio = self.leftover + audio
+        usable = len(audio) // 2 * 2
+        self.leftover = audio[usable:]
+        samples = np.frombuffer(audio[:usable], np.int16)
+
+        while len(samples):
+            space = self.buffer.size - (self.buffer.position - self.read_position)
+            if self.aborted:
+                return False
+            if not space:
+                self.stats["full_waits"] += 1
+                time.sleep(block_time)
+                continue
+            self.buffer.write(samples[:space])
+            samples = samples[space:]
+        return not self.aborted
+
+    def finish(self):
+        """No more audio is coming, play out whatever is left"""
+        self.finished = True
+
+    def abort(self):
+        """Stop right away and throw away whatever is still buffered"""
+        self.aborted = True
+        self.stream.abort()
+        self.done.set()
+
+    def wait(self, timeout=None):
+        """Wait until everything has played, or it was aborted. Returns False on a timeout"""
+        return self.done.wait(timeout)
+
+    def callback(self, outdata, frames, time_info, status):
+        """Runs on the sound card's thread. Only copies, nothing in here allocates"""
+        out = np.frombuffer(outdata, np.int16)
+        available = self.buffer.position - self.read_position
+        self.depths.append(available / self.sample_rate)
+        self.stats["callbacks"] += 1
+        if getattr(status, "output_underflow", False):
+            self.stats["device_underflows"] += 1
+
+        if self.aborted:
+            out.fill(0)
+            return
+
+        if self.buffering:
+            if available < self.threshold and not self.finished:
+                out.fill(0)
+                return
+            self.buffering = False
+            self.threshold = int(rebuffer_time * self.sample_rate) # After the first time it only needs to catch up a little
+
+        count = min(frames, available)
+        start = self.read_position % self.buffer.size
+        first = min(count, self.buffer.size - start)
+        out[:first] = self.buffer.data[start:start + first]
+        out[first:count] = self.buffer.data[:count - first] # Wrapped around
+        out[count:] = 0
+        self.read_position += count
+        if count and self.first_sound is None:
+            self.first_sound = time.perf_counter()
+
+        if count < frames:
+            if self.finished:
+                self.done.set()
+            else: # Ran dry in the middle of the answer, that's an audible gap
+                self.stats["underruns"] += 1
+                self.buffering = True
+
+    def report(self):
+        depths = self.depths.read(0)
+        first = f"{(self.first_sound - self.started_at) * 1000:.0f}ms" if self.first_sound else "never"
+        depth = f"{depths.mean():.2f}s average, {depths.max():.2f}s most" if len(depths) else "no samples"
+        return f"Playback: first sound after {first}, {self.stats['underruns']} underruns, buffer {depth}"
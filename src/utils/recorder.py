@@ -1,122 +1,301 @@
 # Copyright 2026 The Ronny Voice Foundation
 
-import sounddevice as sd
 import numpy as np
-import queue
-import soundfile as sf
-from typing import Any, cast # For casting the sounddevice's input devices to a dict
 import time as timeButDifferentNameAA
 import pvcobra # i love you picovoice
+from .ringbuffer import RingBuffer
+from . import capture, earcon, trace
 
 is_recording = False
 probably_talked = False
-q = queue.Queue() # Create a queue for the queue to queue to (yes i know)
-time_since_last_zero_volume_norm = timeButDifferentNameAA.time() # For the alexa-like "answer when done asking question"
-starting_time = timeButDifferentNameAA.time()
+audio_buffer = None # Preallocated in setup(), the callback writes straight into these
+probability_buffer = None
+endpointer = None # The Endpointer for the current recording
 
 # Settings
-sample_rate = 16000 # Cobra mandates 16000Hz. Why? idk man :(
+sample_rate = capture.sample_rate # Cobra mandates 16000Hz. Why? idk man :(
 channels = 1
-file_name = 'temp_recording.wav' # Make sure to include .wav!
 audio_sensitivity = 15
-finished_speaking_time = 2 # For the alexa-like "answer when done asking question"
+finished_speaking_time = 2 # The longest the silence at the end can ever need to be (see Endpointer)
 not_talking_time = 5 # Add a better feel if you haven't started to talk yet
 max_recording_length = 15 # After __ seconds, just submit with what's there. Otherwise, it could go forever!
+voice_threshold = 0.8 # Cobra probability that counts as talking
+segment_pause_time = 0.6 # For streaming transcription: a pause this long cuts off a segment to send early
+poll_interval = 0.1 # How often the recording thread runs the VAD over the frames that came in since, as one batch. Adds up to this much to endpointing
+gate_rms = 150 # Frames quieter than this (int16 RMS) are silence for sure, so Cobra doesn't even look at them. 0 turns it off
 
-def callback(indata, frames, time, status):
+# Endpointing settings (see Endpointer)
+smoothing = 0.5 # How much each frame moves the smoothed voice probability. Lower is steadier but slower
+start_threshold = 0.8 # Smoothed probability that counts as talking
+stop_threshold = 0.4 # Smoothed probability it has to drop under to count as a pause. In between, nothing changes
+base_silence_time = 1.3 # Seconds of silence that end a normal question. Under about 1.2 cuts off a one second thinking pause
+min_silence_time = 0.5
+short_utterance_time = 0.6 # Less talking than this is usually "um" or the start of a question...
+short_utterance_extra = 0.5 # ...so it gets this much longer
+long_utterance_time = 3 # More talking than this is usually a whole question...
+long_utterance_discount = 0.2 # ...so it gets this much shorter
+min_pause_time = 0.15 # Gaps shorter than this are just between words, not pauses
+pause_margin = 1.3 # The silence has to be this much longer than the longest pause they already took
+confirm_with_transcript = False # End early if the streamed transcript so far ends a sentence. Off since Whisper puts a "." at the end of almost every segment
+confirm_silence_time = 0.5 # Seconds of silence needed before the transcript gets a say
+
+last_probabilities = [] # Voice probability of every frame in the last recording
+stats = {} # For the last recording, see process_frames
+
+class PauseSegmenter:
+    """
+    Watches the voice probability of each frame and says when there's been a long enough pause to cut a segment.
+    Used for streaming transcription, both live and when testing with recorded files.
+    """
+    def __init__(self, frame_length, rate):
+        self.pause_frames = int(segment_pause_time * rate / frame_length)
+        self.silent_frames = 0
+        self.has_speech = False
+
+    def push(self, probability):
+        """Add one frame. Returns true if the segment should be cut after this frame."""
+        if probability > voice_threshold:
+            self.has_speech = True
+            self.silent_frames = 0
+            return False
+
+        self.silent_frames += 1
+        if self.has_speech and self.silent_frames >= self.pause_frames:
+            self.has_speech = False # Start the next segment fresh
+            return True
+        return False
+
+class Endpointer:
+    """
+    Decides when the user is done talking, for the alexa-like "answer when done asking question".
+    The voice probability gets smoothed, and it takes a high probability to start counting as talking but a low one to
+    stop, so one noisy frame doesn't start or end anything. How much silence ends the question depends on how much
+    they've said so far and on how long their pauses have been, and a finished sentence in the streamed transcript
+    can end it sooner. Used live by callback and offline by bench/endpointing.py.
+    """
+    def __init__(self, frame_length, rate):
+        self.frame_time = frame_length / rate
+        self.smoothed = 0.0
+        self.talking = False
+        self.talked = False
+        self.frames = 0
+        self.speech_frames = 0
+        self.silent_frames = 0 # Since they last talked
+        self.last_speech_frame = -1
+        self.longest_pause = 0 # Frames
+
+    def window(self):
+        """Seconds of silence that end the question right now"""
+        speech_time = self.speech_frames * self.frame_time
+        window = base_silence_time
+        if speech_time < short_utterance_time:
+            window += short_utterance_extra
+        elif speech_time > long_utterance_time:
+            window -= long_utterance_discount
+        window = max(window, self.longest_pause * self.frame_time * pause_margin)
+        return min(max(window, min_silence_time), finished_speaking_time)
+
+    def silence(self):
+        """Seconds since they last talked"""
+        return self.silent_frames * self.frame_time
+
+    def push(self, probability):
+        """Add one frame. Returns true if the recording should end after this frame."""
+        self.frames += 1
+        self.smoothed += (probability - self.smoothed) * smoothing
+        if self.smoothed > start_threshold or (self.talking and self.smoothed >= stop_threshold):
+            if not self.talking and self.talked and self.silent_frames * self.frame_time >= min_pause_time:
+                self.longest_pause = max(self.longest_pause, self.silent_frames)
+            self.talking = self.talked = True
+            self.speech_frames += 1
+            self.silent_frames = 0
+            self.last_speech_frame = self.frames - 1
+            return False
+
+        self.talking = False
+        self.silent_frames += 1
+        if not self.talked:
+            return self.silence() > not_talking_time
+        return self.silence() >= self.window()
+
+    def confirms(self, text, transcribed_frames):
+        """
+        Whether a transcript says they're done, before the silence window is up.
+
+        :param text: The transcript of everything up to transcribed_frames
+        :param transcribed_frames: How many frames from the start the transcript covers. Anything said after that isn't in it
+        """
+        if not confirm_with_transcript or not self.talked or self.talking or not text:
+            return False
+        if transcribed_frames <= self.last_speech_frame or self.silence() < confirm_silence_time:
+            return False
+        text = text.rstrip().rstrip('"\')')
+        return text.endswith((".", "?", "!")) and not text.endswith("..")
+
+def callback(pcm, position):
     global is_recording
-    global time_since_last_zero_volume_norm
-    global probably_talked
-    global starting_time
-    global handle
 
-    """This is called for every audio block"""
+    """
+    This is called for every audio block by the shared capture stream, on the audio thread. It only copies the frame
+    into the recording, the VAD runs on the recording thread (see process_frames). Nothing in here allocates
+
+    :param pcm: One frame of int16 audio (Picovoice requirement), a view straight into the capture buffer
+    :param position: Where this frame is in the capture stream
+    """
 
-    # 1. Convert float32 (sounddevice) to int16 (Picovoice requirement)
-    pcm = (indata.flatten() * 32767).astype(np.int16)
-    
-    # 2. Get the probability of voice (0.0 to 1.0)
-    voice_probability = handle.process(pcm)
-    
-    current_time = timeButDifferentNameAA.time()
-    
-    if voice_probability > 0.8:
-        time_since_last_zero_volume_norm = current_time
-        probably_talked = True
+    if audio_buffer.position == 0:
+        capture.mark_recording_started()
 
-    time_difference = current_time - time_since_last_zero_volume_norm
-    if (probably_talked and time_difference > finished_speaking_time) or (not probably_talked and time_difference > not_talking_time):
+    # The buffers are sized so this only stops a recording if max_recording_length couldn't
+    if audio_buffer.position + len(pcm) > audio_buffer.size:
         is_recording = False
+        return
+    audio_buffer.write(pcm)
 
-    time_difference = current_time - starting_time
-    if (probably_talked and time_difference > max_recording_length):
+def process_frames():
+    global is_recording
+    global probably_talked
+
+    """
+    Run the VAD and the endpointer over every frame the callback saved since last time. Frames the energy gate says
+    are silent get a probability of 0 without going through Cobra, and the gate does the whole batch at once
+    """
+    processed = probability_buffer.position
+    written = audio_buffer.position // cobra_frames
+    if written <= processed:
+        return
+
+    cpu_started = timeButDifferentNameAA.thread_time()
+    frames = audio_buffer.read(processed * cobra_frames, written * cobra_frames).reshape(-1, cobra_frames)
+    loud = np.sqrt(np.mean(np.square(frames, dtype=np.float32), axis=1)) >= gate_rms
+
+    for frame, is_loud in zip(frames, loud):
+        # 1. Get the probability of voice (0.0 to 1.0)
+        voice_probability = handle.process(frame) if is_loud else 0.0
+        probability_buffer.append(voice_probability)
+        if endpointer.push(voice_probability):
+            is_recording = False
+    probably_talked = endpointer.talked
+
+    # Don't record forever! Max length out at __ seconds
+    if probably_talked and endpointer.frames * endpointer.frame_time > max_recording_length:
         is_recording = False
 
-    try:
-        q.put(indata.copy()) # Save to a queue as it's more reliable than an array or something off the main thread.
-    except Exception as e:
-        print(f"Callback error: {e}")
+    stats["frames"] += len(frames)
+    stats["gated_frames"] += len(frames) - int(loud.sum())
+    stats["batches"] += 1
+    stats["cpu_time"] += timeButDifferentNameAA.thread_time() - cpu_started
 
-def setup(PICOVOICE_KEY):
+def setup(PICOVOICE_KEY, vad=None):
     global sample_rate
     global handle
     global cobra_frames
+    global audio_buffer
+    global probability_buffer
+
+    """
+    Set up Cobra and the recording buffers.
+
+    :param vad: Use this instead of Cobra. Anything with frame_length and process(pcm) works (the benchmark uses this)
+    """
 
-    handle = pvcobra.create(PICOVOICE_KEY)
+    handle = vad or pvcobra.create(PICOVOICE_KEY)
     cobra_frames = handle.frame_length
 
-def start_recording():
+    # Room for the longest possible recording plus a second for the stream to actually stop
+    max_frames = int((max(max_recording_length, not_talking_time) + 1) * sample_rate / cobra_frames)
+    audio_buffer = RingBuffer(max_frames * cobra_frames, np.int16)
+    probability_buffer = RingBuffer(max_frames, np.float32)
+
+def start_recording(on_segment=None, partial=None):
     global is_recording
-    global time_since_last_zero_volume_norm
     global probably_talked
-    global starting_time
     global cobra_frames
+    global last_probabilities
+    global endpointer
+    global stats
     
     """
     Start recording with all the fun auto-turn-off and more features
+
+    :param on_segment: If given, this gets called with every piece of speech that ends in a pause while still recording,
+        and with whatever speech is left at the end, so it can be transcribed early. It gets the audio and its per-frame voice probabilities.
+    :param partial: If given, returns the transcript of every segment passed to on_segment so far, or None if it isn't done yet.
+        A finished sentence in it can end the recording early (see Endpointer.confirms)
+    :return: A view of the recording buffer (no copy!), so use it before the next recording starts.
     """
 
-    from pathlib import Path
-    BASE_DIR = Path(__file__).resolve().parent.parent
-    listening_sfx = BASE_DIR / "sfx" / "start_listening.wav"
-    if listening_sfx.exists():
-        data, fs = sf.read(str(listening_sfx))
-        sd.play(data, fs)
-        sd.wait()
-    else:
-        print(f"Listening sfx not found! Skipping..: {listening_sfx.parent}")
-
-    recorded_chunks = []
-    q.queue.clear()
-    time_since_last_zero_volume_norm = timeButDifferentNameAA.time() # For the alexa-like "answer when done asking question"
-    starting_time = time_since_last_zero_volume_norm # Don't record forever! Max length out at __ seconds
-
-    with sf.SoundFile(file_name, mode='w', samplerate=sample_rate, channels=channels) as file: # This is to save the audio as a file,
-        with sd.InputStream(samplerate=sample_rate, channels=channels, blocksize=cobra_frames, callback=callback): # And this is to actually record the input in general.
-            is_recording = True
-            probably_talked = False
-            while is_recording:
-                try:
-                    data = q.get(timeout=1) # Get the data from the queue!
-                    # file.write(data)
-                    recorded_chunks.append(data)
-                except queue.Empty:
-                    continue # If there's no queue just don't really do anything
-                except KeyboardInterrupt:
-                    is_recording = False # Ctrl+C to close otherwise it'l be recording forever!
-
-    if recorded_chunks and probably_talked:
+    earcon.play("start_listening") # Doesn't wait for it to finish, the microphone is already open
+
+    audio_buffer.reset()
+    probability_buffer.reset()
+    processed = 0 # Frames the segmenter has seen
+    segment_start = 0
+    segmenter = PauseSegmenter(cobra_frames, sample_rate)
+    endpointer = Endpointer(cobra_frames, sample_rate)
+    stats = {"frames": 0, "gated_frames": 0, "batches": 0, "cpu_time": 0.0, "overflows": capture.stats["overflows"], "dropped_frames": capture.stats["dropped_frames"]}
+
+    def cut_segments():
+        nonlocal processed, segment_start
+        written = probability_buffer.position
+        for frame in range(processed, written):
+            if segmenter.push(probability_buffer.data[frame % probability_buffer.size]):
+                on_segment(audio_buffer.read(segment_start * cobra_frames, (frame + 1) * cobra_frames), probability_buffer.read(segment_start, frame + 1))
+                segment_start = frame + 1
+        processed = written
+
+    # The microphone is already open (see capture.py), this just starts listening to it.
+    # Right after the wake word, this also gets the audio since the wake word so nothing said during the earcon is lost
+    is_recording = True
+    probably_talked = False
+    capture_started = timeButDifferentNameAA.perf_counter()
+    capture.attach(callback, capture.recording_start_position())
+    try:
+        while is_recording:
+            try:
+                timeButDifferentNameAA.sleep(poll_interval) # The callback does the saving, this does everything else
+                process_frames()
+                if on_segment:
+                    cut_segments()
+                if partial and endpointer.confirms(partial(), segment_start):
+                    is_recording = False
+                    trace.record("endpoint_confirmed", timeButDifferentNameAA.perf_counter() - endpointer.silence(), window=round(endpointer.window(), 3))
+            except KeyboardInterrupt:
+                is_recording = False # Ctrl+C to close otherwise it'l be recording forever!
+    finally:
+        capture.detach()
+    process_frames() # Whatever came in since the last batch, so every frame has a probability
+    stats["overflows"] = capture.stats["overflows"] - stats["overflows"]
+    stats["dropped_frames"] = capture.stats["dropped_frames"] - stats["dropped_frames"]
+
+    stopped = timeButDifferentNameAA.perf_counter()
+    trace.record("capture", capture_started, stopped, talked=probably_talked)
+    if probably_talked: # From the last frame with voice in it to the recording actually stopping
+        trace.record("endpointing", stopped - endpointer.silence(), stopped, window=round(endpointer.window(), 3))
+
+    last_probabilities = probability_buffer.read(0)
+
+    if audio_buffer.position and probably_talked:
         print("Finished recording!")
 
-        listening_sfx = BASE_DIR / "sfx" / "end_listening.wav"
-        if listening_sfx.exists():
-            data, fs = sf.read(str(listening_sfx))
-            sd.play(data, fs)
-            sd.wait()
-        else:
-            print(f"Listening sfx not found! Skipping..: {listening_sfx.parent}")
+        if on_segment:
+            cut_segments() # Anything that came in after the loop stopped
+            if segmenter.has_speech: # The last bit, which didn't get a pause because the recording ended
+                on_segment(audio_buffer.read(segment_start * cobra_frames), probability_buffer.read(segment_start))
+
+        earcon.play("end_listening") # Plays while the upload is already happening
             
-        return np.concatenate(recorded_chunks, axis=0)
+        return audio_buffer.read(0)
     else:
         print("No recording data found!")
-        return None
\ No newline at end of file
+        return None
+
+def report():
+    """VAD stats for the last recording"""
+    if not stats.get("frames"):
+        return "VAD: nothing recorded yet"
+    audio_time = stats["frames"] * cobra_frames / sample_rate
+    return (
+        f"VAD: {stats['gated_frames']}/{stats['frames']} frames skipped by the energy gate, {stats['batches']} batches, "
+        f"{stats['cpu_time'] / audio_time * 1000:.1f}ms CPU per second of audio, {stats['overflows']} overflows, {stats['dropped_frames']} dropped frames"
+    )
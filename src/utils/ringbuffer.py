@@ -0,0 +1,59 @@
+# Copyright 2026 The Ronny Voice Foundation
+
+"""
+A preallocated ring buffer for audio, so the audio callback never has to allocate anything.
+"""
+import numpy as np
+
+class RingBuffer:
+    """
+    Fixed size numpy buffer that gets written in place. Positions are counted from the last reset and never wrap,
+    so readers can hold on to a position and know if it has been overwritten yet.
+    """
+    def __init__(self, size, dtype=np.int16):
+        self.data = np.zeros(size, dtype=dtype)
+        self.size = size
+        self.position = 0 # Total items written since the last reset
+
+    def reset(self):
+        self.position = 0
+
+    def write(self, items):
+        """Copy items into the buffer, overwriting the oldest ones if it's full. No allocations."""
+        count = len(items)
+        if count >= self.size: # Only the newest ones fit anyway
+            items = items[-self.size:]
+            self.position += count - self.size
+            count = self.size
+
+        start = self.position % self.size
+        first = min(count, self.size - start)
+        self.data[start:start + first] = items[:first]
+        if first < count: # Wrapped around to the start
+            self.data[:count - first] = items[first:]
+        self.position += count
+
+    def append(self, item):
+        """Write a single item"""
+        self.data[self.position % self.size] = item
+        self.position += 1
+
+    def oldest(self):
+        """Position of the oldest item still in the buffer"""
+        return max(self.position - self.size, 0)
+
+    def read(self, start, end=None):
+        """
+        Get the items from start to end (positions, not indexes).
+        This is a view into the buffer (zero-copy) unless it goes over the wrap point, then it has to be copied.
+        It gets overwritten once the buffer comes back around, so use it before then or copy it!
+        """
+        end = self.position if end is None else end
+        start = max(start, self.oldest())
+        if end <= start:
+            return self.data[:0]
+
+        first, last = start % self.size, end % self.size
+        if first < last or last == 0:
+            return self.data[first:last or self.size]
+        return np.concatenate((self.data[first:], self.data[:last]))
@@ -0,0 +1,112 @@
+# Copyright 2026 The Ronny Voice Foundation
+
+"""
+Picks which Groq model answers each turn. Every question gets a rough difficulty from how long it is, how it's worded
+and whether it probably needs a tool, and then the model with the lowest expected latency that's strong enough for it wins.
+Expected latency comes from each model's own time to first token and tokens per second, measured on every request.
+
+Every decision and how it turned out goes in the trace log (route and route_outcome spans), so the settings can be tuned.
+"""
+import re
+import time
+
+from . import trace
+
+# Settings
+enabled = True
+# name -> strength (0 is chit-chat only, 2 handles anything) and the latency to assume before there are measurements
+models = {
+    'moonshotai/Kimi-K2-Instruct-0905': {"strength": 2, "ttft": 0.5, "tokens_per_second": 200},
+    'llama-3.1-8b-instant': {"strength": 0, "ttft": 0.2, "tokens_per_second": 600},
+}
+default_model = 'moonshotai/Kimi-K2-Instruct-0905' # Used when routing is off
+expected_tokens = 60 # About how long a spoken answer is, to weigh time to first token against tokens per second
+smoothing = 0.3 # How much each new measurement moves the averages
+long_question_words = 25 # Questions this long need at least a normal model
+
+hard_words = re.compile(
+    r"\b(why|how come|explain|compare|difference|versus|vs|pros|cons|should i|recommend|plan|write|story|poem|code|"
+    r"step|steps|summarize|translate|calculate|math|history|science|meaning)\b"
+)
+tool_words = re.compile(
+    r"\b(weather|temperature|rain|forecast|outside|time|date|day|today|tomorrow|clipboard|copied|paste|"
+    r"plus|minus|times|divided|percent|square root|\d)\b"
+)
+chit_chat = re.compile(
+    r"^(hi|hey|hello|yo|sup|thanks|thank you|ok|okay|cool|nice|good (morning|night|afternoon)|how are you|whats up|who are you)\b"
+)
+
+measurements = {} # model -> {"ttft", "tokens_per_second", "samples"}, smoothed
+stats = {} # model -> turns routed to it
+
+def difficulty(question):
+    """0 for chit-chat, 1 for normal questions and anything that needs a tool, 2 for hard ones. Returns (score, features)"""
+    normalized = question.lower().replace("'", "")
+    words = len(normalized.split())
+    features = {
+        "words": words,
+        "hard": bool(hard_words.search(normalized)),
+        "tools_likely": bool(tool_words.search(normalized)),
+        "chit_chat": bool(chit_chat.search(normalized)) and words <= 6,
+    }
+    if features["hard"] or words > long_question_words * 2:
+        score = 2
+    elif features["tools_likely"] or words > long_question_words or not features["chit_chat"]:
+        score = 1
+    else:
+        score = 0
+    return score, features
+
+def expected_latency(name):
+    """Seconds until an average answer is done, from the measurements if there are any"""
+    measured = measurements.get(name) or models[name]
+    return measured["ttft"] + expected_tokens / measured["tokens_per_second"]
+
+def choose(question):
+    """The model for this question. The decision gets logged as a route span"""
+    started = time.perf_counter()
+    if not enabled:
+        return default_model
+
+    score, features = difficulty(question)
+    strong_enough = [name for name, config in models.items() if config["strength"] >= score]
+    if strong_enough:
+        name = min(strong_enough, key=expected_latency)
+    else:
+        name = max(models, key=lambda model: models[model]["strength"])
+
+    stats[name] = stats.get(name, 0) + 1
+    trace.record("route", started, model=name, difficulty=score, expected_latency=round(expected_latency(name), 3), **features)
+    return name
+
+def observe(name, requested, timing):
+    """
+    Fold one finished request into the model's averages.
+
+    :param requested: time.perf_counter() when the request was made
+    :param timing: From streaming.read_stream: "first" and "last" chunk times and "characters" of text
+    """
+    if name not in models or "first" not in timing:
+        return
+    ttft = timing["first"] - requested
+    measured = measurements.setdefault(name, {"ttft": ttft, "tokens_per_second": models[name]["tokens_per_second"], "samples": 0})
+    measured["ttft"] += (ttft - measured["ttft"]) * smoothing
+
+    duration = timing["last"] - timing["first"]
+    tokens = timing["characters"] / 4 # Same rough estimate as context.py
+    tokens_per_second = None
+    if duration > 0.05 and tokens >= 10: # Too short to say anything about the speed
+        tokens_per_second = tokens / duration
+        measured["tokens_per_second"] += (tokens_per_second - measured["tokens_per_second"]) * smoothing
+    measured["samples"] += 1
+
+    trace.record("route_outcome", requested, timing["last"], model=name, ttft=round(ttft, 3),
+                 tokens_per_second=round(tokens_per_second, 1) if tokens_per_second else None)
+
+def report():
+    lines = []
+    for name in models:
+        measured = measurements.get(name)
+        speed = f"first token {measured['ttft'] * 1000:.0f}ms, {measured['tokens_per_second']:.0f} tokens/s" if measured else "not measured yet"
+        lines.append(f"{name}: {stats.get(name, 0)} turns, {speed}")
+    return lines
@@ -0,0 +1,102 @@
+# Copyright 2026 The Ronny Voice Foundation
+
+"""
+Cold start profiling and background initialization.
+
+The wake word gets armed first, and everything that's only needed after it (the Groq and Google clients, Cobra,
+the streaming module) gets built in parallel in the background. Every import and client build is timed,
+so report() can show where the time to armed went, kind of like python -X importtime but built in.
+"""
+import asyncio
+import builtins
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+# Settings
+target_time_to_armed = 3.0 # Seconds from launch until the wake word is listening, on the Pi Zero 2 W
+report_top = 15 # How many of the slowest imports to show
+
+started = time.perf_counter()
+armed_at = None
+imports = {} # module -> [cumulative seconds, self seconds, thread name]
+timings = {} # name -> seconds, for client builds and other setup steps
+futures = {} # name -> Future of background work
+
+executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="startup")
+original_import = builtins.__import__
+local = threading.local() # Per thread stack of imports in progress, to work out self time
+
+def profiled_import(name, globals=None, locals=None, fromlist=(), level=0):
+    """Times every module the first time it's imported. Only installed until the wake word is armed"""
+    if level or name in sys.modules:
+        return original_import(name, globals, locals, fromlist, level)
+
+    stack = local.__dict__.setdefault("stack", [])
+    stack.append(0.0) # Time spent in nested imports, taken off this one's self time
+    began = time.perf_counter()
+    try:
+        return original_import(name, globals, locals, fromlist, level)
+    finally:
+        elapsed = time.perf_counter() - began
+        nested = stack.pop()
+        if stack:
+            stack[-1] += elapsed
+        imports.setdefault(name, [elapsed, elapsed - nested, threading.current_thread().name])
+
+def begin():
+    """Call as early as possible in main.py"""
+    builtins.__import__ = profiled_import
+
+@contextmanager
+def timed(name):
+    """Time a setup step, like building a client"""
+    began = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = time.perf_counter() - began
+
+def background(name, function):
+    """Start building something in the background. Get it later with result() or wait()"""
+    def build():
+        with timed(name):
+            return function()
+    futures[name] = executor.submit(build)
+    return futures[name]
+
+def result(name):
+    """Block until a background build is done, and return it"""
+    return futures[name].result()
+
+async def wait(name):
+    """Same as result(), but for the event loop"""
+    return await asyncio.wrap_future(futures[name])
+
+def mark_armed():
+    """Call right when the wake word starts listening for the first time"""
+    global armed_at
+    if armed_at is None:
+        armed_at = time.perf_counter() - started
+
+def stop_profiling():
+    builtins.__import__ = original_import
+
+def report():
+    """The cold start breakdown, as lines of text"""
+    lines = []
+    if armed_at is not None:
+        verdict = "OK" if armed_at <= target_time_to_armed else "OVER TARGET"
+        lines.append(f"Time to armed: {armed_at:.2f}s (target {target_time_to_armed:.1f}s, {verdict})")
+
+    for name, seconds in sorted(timings.items(), key=lambda item: -item[1]):
+        lines.append(f"  {name:<40}{seconds * 1000:>8.0f}ms")
+
+    top = sorted(imports.items(), key=lambda item: -item[1][0])[:report_top]
+    if top:
+        lines.append(f"  {'import (slowest first)':<40}{'cumul.':>8}  {'self':>8}  thread")
+        for name, (cumulative, self_time, thread) in top:
+            lines.append(f"  {name:<40}{cumulative * 1000:>6.0f}ms  {self_time * 1000:>6.0f}ms  {thread}")
+    return lines
@@ -4,16 +4,16 @@
 Handles both the TTS generation and text generation at the same time, streamed to be faster.
 """
 import json
-import sounddevice as sd
 import queue
 from google.cloud import texttospeech
 import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from datetime import datetime, timezone
+from pathlib import Path
 from rich import console
 
-# moonshotai/Kimi-K2-Instruct-0905
-model = 'moonshotai/Kimi-K2-Instruct-0905' # TODO: have a router to use groq/compound for search results and stuff
-system_prompt = open("src/utils/system_prompt.txt").read()
+system_prompt = (Path(__file__).resolve().parent / "system_prompt.txt").read_text() # Relative to this file, so it works from any folder
 utc_dt = datetime.now(timezone.utc) # UTC time
 dt = utc_dt.astimezone() # local time
 
@@ -31,50 +31,226 @@ audio_config = texttospeech.AudioConfig(
 )
 
 q = queue.Queue()
+player = None # The playback.Player of the latest answer, for its stats
+llm_stream = None # The Groq stream being read right now, so a barge-in can close it without waiting for its next chunk
+llm_timeout = 8 # Seconds to connect, or between two chunks of a streamed completion before it counts as stalled
+tts_timeout = 60 # Seconds a whole TTS stream can take
+failure_message = "Sorry, I'm having trouble connecting right now." # Said if no answer could be made at all
+barge_in_poll = 0.02 # Seconds between checking for a barge-in while the answer plays
 
-from .tools import calculate, dt, weather, clipboard
+from . import bargein, calls, compact, hedge, phrases, playback, router, trace
+from .tools import available_functions, available_tools # Just the schemas, the tools themselves get imported when they're first used
 
-# Map function names to implementations
-available_functions = {
-    "calculate": calculate.calculate,
-    "get_weather_now": weather.get_weather_now,
-    "get_weather_today": weather.get_weather_today,
-    "get_forcast": weather.get_weather_forecast,
-    "get_datetime": dt.get_datetime,
-    "get_clipboard": clipboard.get_clipboard
+# Tool settings
+max_tool_workers = 4 # The Pi only has 4 cores, and these are mostly waiting on the network anyway
+default_tool_timeout = 4 # Seconds
+tool_timeouts = { # Seconds, per tool. Anything not in here uses default_tool_timeout
+    "calculate": 2,
+    "get_datetime": 1,
+    "get_clipboard": 1,
+    "get_weather_now": 5,
+    "get_weather_today": 5,
+    "get_forcast": 5,
 }
-
-available_tools = [calculate.tool_schema, weather.today_tool_schema, weather.now_tool_schema, weather.forcast_tool_schema, dt.tool_schema, clipboard.tool_schema]
+tool_executor = ThreadPoolExecutor(max_workers=max_tool_workers, thread_name_prefix="tool")
+tool_stats = {} # name -> {"calls", "errors", "timeouts", "last_latency", "max_latency"}
 
 
 def execute_tool_call(tool_call):
     """Parse and execute a single tool call"""
-    function_name = tool_call.function.name
+    function_name = tool_call["function"]["name"]
     function_to_call = available_functions[function_name]
-    function_args = json.loads(tool_call.function.arguments)
+    function_args = json.loads(tool_call["function"]["arguments"] or "{}")
     
     # Call the function with unpacked arguments
     return function_to_call(**function_args)
 
-def call_with_tools_and_retry(client, messages, tools, console: console.Console, max_retries=3):
-    """Call model with tools, retrying with adjusted temperature on failure"""
+def record_tool_stat(name, key, latency=None):
+    stat = tool_stats.setdefault(name, {"calls": 0, "errors": 0, "timeouts": 0, "last_latency": 0.0, "max_latency": 0.0})
+    stat[key] += 1
+    if latency is not None:
+        stat["last_latency"] = latency
+        stat["max_latency"] = max(stat["max_latency"], latency)
+
+def timed_tool_call(tool_call):
+    """Runs on the tool executor. Records how long the tool took, even if nobody waited for it"""
+    started = time.perf_counter()
+    try:
+        return execute_tool_call(tool_call)
+    finally:
+        finished = time.perf_counter()
+        record_tool_stat(tool_call["function"]["name"], "calls", finished - started)
+        trace.record("tool:" + tool_call["function"]["name"], started, finished)
+
+def tool_report():
+    """Calls, errors, timeouts and latency for every tool that's been used, as lines of text"""
+    return [
+        f"{name}: {stat['calls']} calls, {stat['errors']} errors, {stat['timeouts']} timeouts, "
+        f"{stat['last_latency'] * 1000:.0f}ms last, {stat['max_latency'] * 1000:.0f}ms slowest"
+        for name, stat in tool_stats.items()
+    ]
+
+def run_tool_calls(tool_calls, console: console.Console):
+    """
+    Run all the tool calls at the same time, so the slowest tool sets the wait instead of all of them added up.
+    Every call gets its own deadline and its own result message, and results come back in the same order as the calls.
+    Stops waiting as soon as the turn is cancelled (like on a barge-in), so the user can be listened to again right away.
+    
+    :param tool_calls: The tool calls from read_stream.
+    :return: A tool message for every call.
+    """
+    started = time.perf_counter()
+    turn = calls.turn
+    futures = [tool_executor.submit(timed_tool_call, tool_call) for tool_call in tool_calls]
+    messages = []
+
+    def result(future, deadline):
+        """future.result(), but a cancelled turn raises TurnExpired instead of waiting any longer"""
+        while not future.done():
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                raise FutureTimeoutError()
+            if turn.cancelled.wait(min(remaining, barge_in_poll)):
+                raise calls.TurnExpired("The turn was cancelled")
+        return future.result()
+
+    for tool_call, future in zip(tool_calls, futures):
+        name = tool_call["function"]["name"]
+        timeout = tool_timeouts.get(name, default_tool_timeout)
+
+        try:
+            content = available_functions[name].encode(result(future, started + timeout))
+        except calls.TurnExpired:
+            future.cancel() # Like a timeout, a tool that's already running finishes in the background
+            content = f"Tool error: {name} was interrupted."
+        except FutureTimeoutError:
+            future.cancel() # Only works if it hasn't started yet, otherwise the thread just finishes in the background
+            record_tool_stat(name, "timeouts")
+            content = f"Tool error: {name} took longer than {timeout} seconds."
+            console.print(f"Tool {name} timed out after {timeout}s")
+        except Exception as e:
+            record_tool_stat(name, "errors")
+            content = f"Tool error: {e}"
+            console.print(f"Tool {name} had an error: {e}")
+
+        messages.append({
+            "role": "tool",
+            "tool_call_id": tool_call["id"],
+            "name": name,
+            "content": content
+        })
+
+    trace.record("tools", started, count=len(tool_calls))
+    tokens = sum(len(message["content"]) for message in messages) // compact.characters_per_token
+    console.print(f"Ran {len(tool_calls)} tool(s) in {time.perf_counter() - started:.2f}s, {tokens} tokens of results")
+    return messages
+
+def is_tool_call_error(e):
+    """Groq sends back a 400 (or a tool_use_failed error mid-stream) when the model writes a bad tool call"""
+    return getattr(e, 'status_code', None) == 400 or 'tool_use_failed' in str(e)
+
+def read_stream(stream, on_text, timing=None):
+    """
+    Read a streamed completion, sending text to on_text as soon as it shows up and putting the tool call deltas back together.
+    
+    :param stream: The streamed completion from Groq.
+    :param on_text: Gets called with every piece of text content.
+    :param timing: If given, gets the "first" and "last" chunk times and how many "characters" came, for router.py.
+    :return: The full text, and the finished tool calls in the order the model made them.
+    """
+    global llm_stream
+
+    text = ""
+    tool_calls = {} # index -> tool call, the arguments come in a few characters at a time
+    timing = timing if timing is not None else {}
+    timing["characters"] = 0
+
+    llm_stream = stream
+    try:
+        for chunk in stream:
+            if bargein.interrupted.is_set() or calls.turn.expired(): # Nobody will hear the rest, stop paying for tokens
+                close_llm_stream()
+                break
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            timing.setdefault("first", time.perf_counter())
+            timing["last"] = time.perf_counter()
+            timing["characters"] += len(delta.content or "") + sum(len(call.function.arguments or "") for call in delta.tool_calls or [] if call.function)
+
+            if delta.content:
+                text += delta.content
+                on_text(delta.content)
+
+            for call in delta.tool_calls or []:
+                tool_call = tool_calls.setdefault(call.index, {"id": "", "type": "function", "function": {"name": "", "arguments": ""}})
+                if call.id:
+                    tool_call["id"] = call.id
+                if call.function:
+                    tool_call["function"]["name"] += call.function.name or ""
+                    tool_call["function"]["arguments"] += call.function.arguments or ""
+    except Exception:
+        if not (bargein.interrupted.is_set() or calls.turn.cancelled.is_set()):
+            raise
+        # Closed from stream_data on a barge-in, that's not the connection failing
+    finally:
+        llm_stream = None
+
+    return text, [tool_calls[index] for index in sorted(tool_calls)]
+
+def close_llm_stream():
+    """Stop the Groq stream that's being read, from any thread. read_stream returns with whatever it got so far"""
+    stream = llm_stream
+    try:
+        getattr(stream, "close", lambda: None)()
+    except Exception: # Like a generator (the benchmark's stand-in) that's in the middle of yielding
+        pass
+
+def timed_read(model, requested, stream, on_text):
+    """read_stream, telling the router how fast the model was. requested is when the request was made"""
+    timing = {}
+    try:
+        return read_stream(stream, on_text, timing)
+    finally:
+        router.observe(model, requested, timing)
+
+def call_with_tools_and_retry(client, messages, tools, console: console.Console, max_retries=3, on_text=lambda text: None, model=router.default_model):
+    """
+    Stream a response with tools attached, retrying with adjusted temperature on failure.
+    Text is passed to on_text while it streams, so if the model doesn't want a tool this is the only request needed.
+    """
     
-    # Start with moderate temperature
-    temperature = 1.0
+    # Start with the normal answering temperature
+    temperature = 0.6
     
     for attempt in range(max_retries):
-        try:
-            response = client.chat.completions.create(
+        sent_text = False
+
+        def forward(text):
+            nonlocal sent_text
+            sent_text = True
+            on_text(text)
+
+        def request(timeout):
+            requested = time.perf_counter()
+            stream = calls.with_timeout(client, timeout).chat.completions.create(
                 model=model,
                 messages=messages,
                 tools=tools,
                 tool_choice="auto",
-                temperature=temperature
+                temperature=temperature,
+                max_completion_tokens=300, # System prompt says it only has 200 tokens, so we just lie just in case to make it so it won't cut off
+                top_p=1,
+                stream=True,
             )
-            return response
+            return timed_read(model, requested, stream, forward)
+
+        try:
+            # Dropped connections and such get retried in there, but only if nothing was said yet
+            return calls.call("groq", request, llm_timeout, retry_if=lambda e: not sent_text and calls.is_transient(e))
         except Exception as e:
-            # Check if this is a tool call generation error
-            if hasattr(e, 'status_code') and e.status_code == 400: # type: ignore
+            # Check if this is a tool call generation error. Once text has been spoken there's no taking it back, so no retry then
+            if is_tool_call_error(e) and not sent_text:
                 if attempt < max_retries - 1:
                     # Decrease temperature for next attempt to reduce hallucinations
                     temperature = max(temperature - 0.2, 0.2)
@@ -84,63 +260,119 @@ def call_with_tools_and_retry(client, messages, tools, console: console.Console,
             raise e
     raise Exception("Failed to generate valid tool calls after retries")
 
-def stream_response_to_tts(groq_client, context, console: console.Console):
+def stream_without_tools(client, messages, on_text, model=router.default_model):
+    """Stream a plain response, retrying transient errors as long as nothing was said yet"""
+    sent_text = False
+
+    def forward(text):
+        nonlocal sent_text
+        sent_text = True
+        on_text(text)
+
+    def request(timeout):
+        requested = time.perf_counter()
+        stream = calls.with_timeout(client, timeout).chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=0.6,
+            max_completion_tokens=300,
+            top_p=1,
+            stream=True,
+            stop=None,
+        )
+        return timed_read(model, requested, stream, forward)
+
+    return calls.call("groq", request, llm_timeout, retry_if=lambda e: not sent_text and calls.is_transient(e))
+
+def stream_response_to_tts(groq_client, context, console: console.Console, answer=None):
     """
     Request a response from Groq, streaming the result to tts.py
     
     :param client: The client for the script to connect to.
     :param context: The context for the model, including the current question.
+    :param answer: A list that the response text gets appended to. With tools, only the text after the tool results ends
+        up in it, what was said before is already in the context as the content of the tool call message.
     """
+    answer = answer if answer is not None else []
+    requested = time.perf_counter()
+    spoken = False
+
+    def speak(text):
+        nonlocal spoken
+        if not spoken:
+            trace.record("llm_first_token", requested)
+            spoken = True
+        q.put(text)
+        answer.append(text)
+        console.print(text, end="")
+
+    system_message = {
+        'role': 'system',
+        'content': system_prompt,
+    }
+    question = next((message["content"] for message in reversed(context) if message["role"] == "user"), "")
+    model = router.choose(question)
 
     try:
-        response = call_with_tools_and_retry(groq_client, context, available_tools, console, 4)
-
-        if response.choices[0].message.tool_calls:
-            # 3. Execute each tool call (using the helper function from step 2)
-            for tool_call in response.choices[0].message.tool_calls:
-                console.print(f"Tool being used: {tool_call.function.name}")
-                function_response = execute_tool_call(tool_call)
-                # Add tool result to messages
-                context.append({
-                    "role": "tool",
-                    "tool_call_id": tool_call.id,
-                    "name": tool_call.function.name,
-                    "content": str(function_response)
-                })
-    except Exception as e:
+        try:
+            with trace.span("llm_first_request", model=model) as attributes:
+                text, tool_calls = call_with_tools_and_retry(groq_client, [system_message] + context, available_tools, console, 4, speak, model)
+                attributes["tool_calls"] = len(tool_calls)
+        except Exception as e:
+            console.print("Model tool had an error: " + str(e))
+            text, tool_calls = "", []
+            if spoken: # Already said part of it, don't start over
+                return
+            # Same thing as before tools, just without them
+            stream_without_tools(groq_client, [system_message] + context, speak, model)
+
+        if not tool_calls or bargein.interrupted.is_set():
+            return
+
+        # The assistant message has to go in before the results so every tool result has its call
         context.append({
-            "role": "tool",
-            "tool_call_id": "0",
-            "name": "Tool error handler",
-            "content": "Tool error!"
+            "role": "assistant",
+            "content": text or None,
+            "tool_calls": tool_calls,
         })
-        console.print("Model tool had an error: " + str(e))
-
-    # 4. Send results back and get final response
-    final = groq_client.chat.completions.create(
-        model=model,
-        messages =
-        [{
-            'role': 'system',
-            'content': system_prompt,
-        }] + context, # Just add all the context passed in! Very easy :D
-        temperature=0.6,
-        max_completion_tokens=300, # System prompt says it only has 200 tokens, so we just lie just in case to make it so it won't cut off
-        top_p=1,
-        stream=True,
-        stop=None,
-    )
+        answer.clear() # Saved just above, so the final assistant message only gets what comes after the results
 
-    for chunk in final:
-        q.put(chunk.choices[0].delta.content or "")
-        console.print(chunk.choices[0].delta.content or "", end="")
-    
+        for tool_call in tool_calls:
+            console.print(f"Tool being used: {tool_call['function']['name']}")
+        context.extend(run_tool_calls(tool_calls, console))
+        if bargein.interrupted.is_set():
+            return
+
+        # Only now is a second request needed: send results back and get final response
+        stream_without_tools(groq_client, [system_message] + context, speak, model) # Just add all the context passed in! Very easy :D
+    except Exception as e:
+        console.print(f"Couldn't get an answer: {e}")
+        if not spoken and not calls.turn.cancelled.is_set(): # Better than silence, unless nobody is listening anymore
+            speak(failure_message)
+    finally:
+        q.put(None) # Always end the TTS stream, even if something blew up
+
+def stream_text_to_tts(text, console: console.Console, answer):
+    """Send already written text to tts (for answers that didn't need the LLM)"""
+    q.put(text)
+    answer.append(text)
+    console.print(text, end="")
     q.put(None)
 
-def stream_data(groq_client, google_client, context, console: console.Console):
+def open_output_stream(callback, blocksize):
+    """The speaker, pulling audio from callback. This is its own function so the benchmark can swap in a null sink"""
+    import sounddevice as sd # Here so the benchmark runs without PortAudio
+    return sd.RawOutputStream(samplerate=audio_config.sample_rate_hertz, channels=1, dtype='int16', blocksize=blocksize, callback=callback)
+
+def stream_data(groq_client, google_client, context, console: console.Console, text=None):
     global q
+    global player
+
+    """
+    Synthesizes speech from a stream of input text.
 
-    """Synthesizes speech from a stream of input text."""
+    :param text: If given, this gets spoken instead of asking the LLM
+    """
     from google.cloud import texttospeech
 
     # See https://cloud.google.com/text-to-speech/docs/voices for all voices.
@@ -153,34 +385,76 @@ def stream_data(groq_client, google_client, context, console: console.Console):
         streaming_config=streaming_config
     )
 
-    # Request generator. Consider using Gemini or another LLM with output streaming as a generator.
-    def request_generator():
-        yield config_request
-        is_tts_running = True
-        
-        while is_tts_running:
-            try:
-                data = q.get(timeout=3) # Get the data from the queue!
-                if data == None:
-                    is_tts_running = False
-                    return
-                yield texttospeech.StreamingSynthesizeRequest(
-                    input=texttospeech.StreamingSynthesisInput(markup=data)
-                )
-            except queue.Empty:
-                console.print("Empty queue! Telling TTS to just say nothing so it doesn't error out.")
+    # The LLM deltas get grouped into phrases first so we don't send a message per token.
+    # They're kept in a list so the hedge (see hedge.py) can start a second Google stream partway through
+    def open_cloud_stream(start, stop_sending):
+        def request_generator():
+            yield config_request
+
+            for chunk in phrase_list.read(start):
+                if bargein.interrupted.is_set() or calls.turn.expired() or stop_sending.is_set():
+                    return # Ends the TTS request stream, instead of sending empty keepalives forever
+                if not chunk:
+                    console.print("Empty queue! Telling TTS to just say nothing so it doesn't error out.")
+                    phrases.stats["keepalives"] += 1
+                phrases.stats["messages_sent"] += 1
                 yield texttospeech.StreamingSynthesizeRequest(
-                    input=texttospeech.StreamingSynthesisInput(markup="")
+                    input=texttospeech.StreamingSynthesisInput(markup=chunk)
                 )
+        calls.check("google")
+        calls.stat("google", "calls")
+        # The audio can be behind the text by as much as the jitter buffer holds, so that's on top of the turn's time
+        timeout = min(tts_timeout, calls.turn.remaining() + playback.max_buffer_time)
+        return google_client.streaming_synthesize(request_generator(), timeout=timeout)
     
+    started_at = time.perf_counter()
     q = queue.Queue()
-    response_thread = threading.Thread(target=stream_response_to_tts, args=(groq_client, context, console))
-    response_thread.start()
-    
-    console.print('Started TTS!', )
+    answer = []
+    if text is None:
+        response_thread = threading.Thread(target=stream_response_to_tts, args=(groq_client, context, console, answer))
+    else:
+        response_thread = threading.Thread(target=stream_text_to_tts, args=(text, console, answer))
+    phrase_list = phrases.PhraseList()
+    player = playback.Player(audio_config.sample_rate_hertz, open_output_stream)
+    speech = hedge.HedgedSpeech(open_cloud_stream, phrase_list, player, audio_config.sample_rate_hertz)
+
+    bargein.start() # The user can talk over the answer to stop it, from here on
+    try:
+        response_thread.start()
+        threading.Thread(target=phrase_list.collect, args=(phrases.coalesce(q, started_at),), name="phrases").start()
+
+        console.print('Started TTS!', )
 
-    streaming_responses = google_client.streaming_synthesize(request_generator())
+        receiver = threading.Thread(target=speech.run, name="tts")
+        with player:
+            receiver.start()
+            while not player.wait(barge_in_poll):
+                if bargein.interrupted.is_set():
+                    player.abort() # Drops whatever is still buffered
+                    bargein.mark_silent()
+                    calls.turn.cancel() # Wakes up any retry that's waiting and stops new requests for this answer
+                    close_llm_stream() # So the answer thread doesn't sit waiting for Groq's next chunk
+                    speech.cancel() # No more audio from Google
+                    console.print(f"\n[dim]Interrupted. {bargein.report()}[/dim]")
+        receiver.join()
+        if speech.error:
+            calls.turn.cancel() # Nobody can hear the rest of the answer, so the LLM can stop too
+    except BaseException:
+        calls.turn.cancel()
+        raise
+    finally:
+        bargein.stop()
+        if response_thread.ident is not None: # Started, so it's still using q and the turn
+            response_thread.join()
+    if speech.first_audio is not None:
+        trace.record("tts_first_audio", started_at, speech.first_audio)
+        trace.record("playback", speech.first_audio)
+    if player.first_sound is not None:
+        trace.record("first_sound", started_at, player.first_sound, prebuffer=playback.prebuffer_time)
+    if speech.error:
+        raise speech.error
 
-    with sd.RawOutputStream(samplerate=audio_config.sample_rate_hertz, channels=1, dtype='int16') as stream: # And this is to actually record the input in general.
-        for response in streaming_responses:
-            stream.write(response.audio_content)
\ No newline at end of file
+    stats = phrases.stats
+    console.print(f"\nTTS: {stats['messages_sent']} messages from {stats['deltas']} deltas ({stats['empty_deltas']} empty), first chunk after {stats['first_chunk_latency'] or 0:.2f}s")
+    console.print(f"[dim]{player.report()}. {hedge.report()}[/dim]")
+    return "".join(answer)
\ No newline at end of file
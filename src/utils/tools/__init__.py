@@ -0,0 +1,87 @@
+# Copyright 2026 The Ronny Voice Foundation
+
+"""
+Every tool the model can use. Only the name and schema are declared here, the module behind a tool
+(and whatever heavy stuff it imports, like openmeteo for the weather) only gets imported the first time the tool is called.
+"""
+import importlib
+import time
+
+from .. import compact
+
+import_times = {} # module -> seconds it took to import
+default_token_budget = 150 # Most tokens a tool result can take in the context
+
+class Tool:
+    """
+    A tool the model can call. Calling it imports the module on first use, then calls the function.
+
+    :param parameters: name -> (JSON type, description). All of them are required
+    :param token_budget: Most tokens the result can take, see compact.py
+    """
+    def __init__(self, name, module, function, description, parameters=None, token_budget=default_token_budget):
+        self.name = name
+        self.module = module
+        self.function = function
+        self.description = description
+        self.parameters = parameters or {}
+        self.token_budget = token_budget
+        self.implementation = None
+
+    @property
+    def schema(self):
+        """The schema Groq wants, generated from the declaration"""
+        function = {"name": self.name, "description": self.description}
+        if self.parameters:
+            function["parameters"] = {
+                "type": "object",
+                "properties": {
+                    name: {"type": kind, "description": description}
+                    for name, (kind, description) in self.parameters.items()
+                },
+                "required": list(self.parameters),
+            }
+        return {"type": "function", "function": function}
+
+    def load(self):
+        if self.implementation is None:
+            self.implementation = getattr(load_module(self.module), self.function)
+        return self.implementation
+
+    def __call__(self, **kwargs):
+        return self.load()(**kwargs)
+
+    def encode(self, result):
+        """The result as compact text for the model"""
+        return compact.encode(self.name, result, self.token_budget)
+
+def load_module(name):
+    """Import a tool module, timing it the first time"""
+    started = time.perf_counter()
+    module = importlib.import_module(f"{__name__}.{name}")
+    import_times.setdefault(name, time.perf_counter() - started)
+    return module
+
+registry = [
+    Tool("calculate", "calculate", "calculate", "Evaluate a mathematical expression using the numexpr framework",
+         {"expression": ("string", "The mathematical expression to evaluate")}),
+    Tool("get_weather_today", "weather", "get_weather_today", "Get the weather for the rest of the day, hourly, using the user's estimated location"),
+    Tool("get_weather_now", "weather", "get_weather_now", "Get the current weather at the exact moment, using the user's estimated location"),
+    Tool("get_forcast", "weather", "get_weather_forecast", "Get the next 7 days forcast, using the user's estimated location",
+         token_budget=250),
+    Tool("get_datetime", "dt", "get_datetime", "Get the current user's date and time based on their time zone."),
+    Tool("get_clipboard", "clipboard", "get_clipboard", "Get the user's clipboard, if available.", token_budget=400),
+]
+
+# Map function names to implementations
+available_functions = {tool.name: tool for tool in registry}
+available_tools = [tool.schema for tool in registry]
+
+def preload():
+    """Import every tool module. Runs as an idle task so the first tool call of the day doesn't pay for it"""
+    for tool in registry:
+        tool.load()
+
+def report():
+    """Import cost of each tool module that's been loaded, slowest first"""
+    return [f"{name}: {seconds * 1000:.0f}ms" for name, seconds in sorted(import_times.items(), key=lambda item: -item[1])]
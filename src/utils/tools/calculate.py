@@ -8,21 +8,3 @@ def calculate(expression: str) -> str:
         return str(result)
     except Exception as e:
         return f"Error: {str(e)}. Please tell the user the error that occured exactly."
-
-tool_schema = {
-  "type": "function",
-  "function": {
-    "name": "calculate",
-    "description": "Evaluate a mathematical expression using the numexpr framework",
-    "parameters": {
-      "type": "object",
-      "properties": {
-        "expression": {
-          "type": "string",
-          "description": "The mathematical expression to evaluate"
-        }
-      },
-      "required": ["expression"]
-    }
-  }
-}
\ No newline at end of file
@@ -10,13 +10,3 @@ def get_clipboard() -> str:
       return "Clipboard either not available or is empty!";
     except:
       return "Clipboard either not available or is empty!";
-
-tool_schema = {
-  "type": "function",
-  "function": {
-    "name": "get_clipboard",
-    "description": "Get the user's clipboard, if available.",
-  }
-}
-
-get_clipboard()
\ No newline at end of file
@@ -1,14 +1,9 @@
 from datetime import datetime, timezone
 
-def get_datetime():
+def now():
     utc_dt = datetime.now(timezone.utc) # UTC time
-    dt = utc_dt.astimezone() # local time
-    return f"It is {dt.ctime()} ({dt.tzinfo}). Only give the user the info they asked for."
+    return utc_dt.astimezone() # local time
 
-tool_schema = {
-  "type": "function",
-  "function": {
-    "name": "get_datetime",
-    "description": "Get the current user's date and time based on their time zone.",
-  }
-}
\ No newline at end of file
+def get_datetime():
+    dt = now()
+    return f"It is {dt.ctime()} ({dt.tzinfo}). Only give the user the info they asked for."
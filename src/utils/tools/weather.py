@@ -1,26 +1,66 @@
+import threading
+import time
+
+from datetime import datetime, timezone
+
+import numpy as np
 import openmeteo_requests
 
-import pandas as pd
-import requests_cache
+import requests
 from retry_requests import retry
 import geocoder
 
-# Setup thing
-g = geocoder.ipinfo('me')
+# Settings
+refresh_age = 10 * 60 # Seconds before the idle task fetches a new snapshot. Open-Meteo updates the current weather every 15 minutes
+max_age = 30 * 60 # Seconds before a snapshot is too old to answer from, and a tool call has to fetch a new one itself
+max_stale_age = 3 * 60 * 60 # If fetching fails, a snapshot up to this old is still better than nothing
+
+# Setup thing. The location is looked up the first time it's needed instead of on import
+g = None
 
-# Setup the Open-Meteo API client with cache and retry on error
-cache_session = requests_cache.CachedSession('.cache', expire_after = 3600)
-retry_session = retry(cache_session, retries = 5, backoff_factor = 0.2)
+def location():
+  global g
+  if g is None or not g.latlng:
+    g = geocoder.ipinfo('me')
+  return g.latlng
+
+# Setup the Open-Meteo API client with retry on error. The snapshot below is the cache
+retry_session = retry(requests.Session(), retries = 5, backoff_factor = 0.2)
 openmeteo = openmeteo_requests.Client(session = retry_session) # pyright: ignore[reportArgumentType]
 
-def get_weather_now():
+# Everything the tools answer from, parsed ahead of time. Replaced whole, never changed in place
+snapshot = None
+fetch_lock = threading.Lock()
+stats = {"hits": 0, "misses": 0, "stale": 0, "fetches": 0, "errors": 0, "last_fetch_time": None, "total_fetch_time": 0.0}
+
+weather_codes = [ # (highest WMO code, how to say it)
+  (0, "clear"), (3, "partly cloudy"), (48, "foggy"), (57, "drizzling"), (67, "raining"),
+  (77, "snowing"), (82, "rainy with showers"), (86, "snowy with showers"), (99, "stormy"),
+]
+
+def describe(code):
+  return next((words for highest, words in weather_codes if code <= highest), "")
+
+def series(variables, names):
+  """Unix times and the values of each variable, as numpy arrays. No DataFrames, they're slow to build and to read"""
+  data = {"time": np.arange(variables.Time(), variables.TimeEnd(), variables.Interval())}
+  for index, name in enumerate(names):
+    data[name] = variables.Variables(index).ValuesAsNumpy() # type: ignore
+  return data
+
+def fetch():
+  """Get the current, hourly and daily weather in one request and parse all of it"""
   # Make sure all required weather variables are listed here
   # The order of variables in hourly or daily is important to assign them correctly below
   url = "https://api.open-meteo.com/v1/forecast"
   params = {
-    "latitude": g.latlng[0],
-    "longitude": g.latlng[1],
+    "latitude": location()[0],
+    "longitude": location()[1],
     "current": ["temperature_2m", "precipitation", "rain", "weather_code"],
+    "hourly": ["temperature_2m", "precipitation", "rain", "weather_code"],
+    "daily": ["temperature_2m_max", "temperature_2m_min", "precipitation_sum", "rain_sum", "weather_code"],
+    "forecast_days": 7,
+    "timezone": "auto", # Days start at midnight where the user is, not in UTC
     "temperature_unit": "fahrenheit",
   }
   responses = openmeteo.weather_api(url, params=params)
@@ -30,135 +70,131 @@ def get_weather_now():
 
   # Process current data. The order of variables needs to be the same as requested.
   current = response.Current()
-  
-  # Assign by index based on the list above
-  temp = current.Variables(0).Value() # type: ignore
-  precip = current.Variables(1).Value() # type: ignore
-  rain = current.Variables(2).Value() # type: ignore
-  code = current.Variables(3).Value() # type: ignore
-
-  return (
-    f"Temp: {temp}°F\n"
-    f"Precipitation: {precip}mm\n"
-    f"Rain: {rain}mm\n"
-    f"WMO Code: {code}"
-  )
+  current_data = {
+    "temperature": current.Variables(0).Value(), # type: ignore
+    "precipitation": current.Variables(1).Value(), # type: ignore
+    "rain": current.Variables(2).Value(), # type: ignore
+    "weather_code": current.Variables(3).Value(), # type: ignore
+  }
 
-def get_weather_today():
-  # Make sure all required weather variables are listed here
-  # The order of variables in hourly or daily is important to assign them correctly below
-  url = "https://api.open-meteo.com/v1/forecast"
-  params = {
-    "latitude": g.latlng[0],
-    "longitude": g.latlng[1],
-    "hourly": ["temperature_2m", "precipitation", "rain", "weather_code"],
-    "forecast_days": 1,
-    "temperature_unit": "fahrenheit",
+  return {
+    "fetched_at": time.monotonic(),
+    "utc_offset": response.UtcOffsetSeconds(),
+    "current": current_data,
+    "hourly": series(response.Hourly(), ["temperature", "precipitation", "rain", "weather_code"]),
+    "daily": series(response.Daily(), ["high", "low", "precipitation", "rain", "weather_code"]),
   }
-  
-  responses = openmeteo.weather_api(url, params=params)
 
-  # Process first location. Add a for-loop for multiple locations or weather models
-  response = responses[0]
+def refresh(if_older_than=0):
+  """
+  Fetch a new snapshot. Keeps the old one if it fails.
+
+  :param if_older_than: Seconds. If another thread fetched one at least this new while this was waiting for the lock, that one gets returned instead
+  """
+  global snapshot
+  with fetch_lock:
+    if age() < if_older_than: # Parallel tool calls all miss at once, only the first one has to fetch
+      return snapshot
+    started = time.perf_counter()
+    try:
+      snapshot = fetch()
+    except Exception:
+      stats["errors"] += 1
+      raise
+    finally:
+      elapsed = time.perf_counter() - started
+      stats["fetches"] += 1
+      stats["last_fetch_time"] = elapsed
+      stats["total_fetch_time"] += elapsed
+  return snapshot
+
+def age():
+  return time.monotonic() - snapshot["fetched_at"] if snapshot else float("inf")
+
+def refresh_if_due():
+  """Runs as an idle task, so the tools almost never have to wait on Open-Meteo"""
+  if age() >= refresh_age:
+    refresh(refresh_age)
+
+def get_snapshot():
+  """The latest snapshot, fetching a new one first if it's too old"""
+  if age() < max_age:
+    stats["hits"] += 1
+    return snapshot
+
+  stats["misses"] += 1
+  try:
+    return refresh(max_age)
+  except Exception:
+    if age() < max_stale_age: # Offline, old weather beats no weather
+      stats["stale"] += 1
+      return snapshot
+    raise
+
+def report():
+  average = stats["total_fetch_time"] / stats["fetches"] * 1000 if stats["fetches"] else 0
+  return (
+    f"Weather: {stats['hits']} hits, {stats['misses']} misses, {stats['stale']} stale answers, "
+    f"{stats['fetches']} fetches ({average:.0f}ms on average, {stats['errors']} errors)"
+  )
 
-  # Process hourly data. The order of variables needs to be the same as requested.
-  hourly = response.Hourly()
-  if not hourly:
-    return
-
-  hourlyTemperature = hourly.Variables(0)
-  hourlyPrecipitation = hourly.Variables(1)
-  hourlyRain = hourly.Variables(2)
-  hourlyWeather = hourly.Variables(3)
-  
-  temp = hourlyTemperature.ValuesAsNumpy() # type: ignore
-  precip = hourlyPrecipitation.ValuesAsNumpy() # type: ignore
-  rain = hourlyRain.ValuesAsNumpy() # type: ignore
-  code = hourlyWeather.ValuesAsNumpy() # type: ignore
-
-  hourly_data = {"date": pd.date_range(
-    start = pd.to_datetime(hourly.Time(), unit = "s", utc = True),
-    end =  pd.to_datetime(hourly.TimeEnd(), unit = "s", utc = True),
-    freq = pd.Timedelta(seconds = hourly.Interval()),
-    inclusive = "left"
-  )}
-
-  hourly_data["temperature_2m"] = temp # type: ignore
-  hourly_data["precipitation"] = precip # type: ignore
-  hourly_data["rain"] = rain # type: ignore
-  hourly_data["weather_code"] = code # type: ignore
-
-  hourly_dataframe = pd.DataFrame(data = hourly_data)
-  return "Hourly data\n", hourly_dataframe
+def current_conditions():
+  """The current weather as a dict, for when it doesn't need to go through the LLM"""
+  return get_snapshot()["current"]
 
-def get_weather_forecast():
-  # Make sure all required weather variables are listed here
-  # The order of variables in hourly or daily is important to assign them correctly below
-  url = "https://api.open-meteo.com/v1/forecast"
-  params = {
-    "latitude": g.latlng[0],
-    "longitude": g.latlng[1],
-    "daily": ["temperature_2m_max", "temperature_2m_min", "precipitation_sum", "rain_sum", "weather_code"],
-    "temperature_unit": "fahrenheit",
-  }
-  responses = openmeteo.weather_api(url, params=params)
+def local_time(timestamp, utc_offset):
+  return datetime.fromtimestamp(timestamp + utc_offset, timezone.utc)
 
-  # Process first location. Add a for-loop for multiple locations or weather models
-  response = responses[0]
+def clock(timestamp, utc_offset):
+  return local_time(timestamp, utc_offset).strftime("%-I%p")
 
-  # Process daily data. The order of variables needs to be the same as requested.
-  daily = response.Daily()
-  if not daily:
-    return
-  
-  dailyTemperatureMin = daily.Variables(0)
-  dailyTemperatureMax = daily.Variables(0)
-  dailyPrecipitation = daily.Variables(1)
-  dailyRain = daily.Variables(2)
-  dailyWeather = daily.Variables(3)
-  
-  tempMin = dailyTemperatureMin.ValuesAsNumpy() # type: ignore
-  tempMax = dailyTemperatureMax.ValuesAsNumpy() # type: ignore
-  precip = dailyPrecipitation.ValuesAsNumpy() # type: ignore
-  rain = dailyRain.ValuesAsNumpy() # type: ignore
-  code = dailyWeather.ValuesAsNumpy() # type: ignore
-
-  daily_data = {"date": pd.date_range(
-    start = pd.to_datetime(daily.Time(), unit = "s", utc = True),
-    end =  pd.to_datetime(daily.TimeEnd(), unit = "s", utc = True),
-    freq = pd.Timedelta(seconds = daily.Interval()),
-    inclusive = "left"
-  )}
-
-  daily_data["temperature_2m_min"] = tempMin # type: ignore
-  daily_data["temperature_2m_max"] = tempMax # type: ignore
-  daily_data["precipitation"] = precip # type: ignore
-  daily_data["rain"] = rain # type: ignore
-  daily_data["weather_code"] = code # type: ignore
-
-  daily_dataframe = pd.DataFrame(data = daily_data)
-  return "Daily data\n", daily_dataframe
-
-now_tool_schema = {
-  "type": "function",
-  "function": {
-    "name": "get_weather_now",
-    "description": "Get the current weather at the exact moment, using the user's estimated location",
+def get_weather_now():
+  weather = current_conditions()
+  return {
+    "temp_f": weather["temperature"],
+    "precipitation_mm": weather["precipitation"],
+    "rain_mm": weather["rain"],
+    "conditions": describe(weather["weather_code"]),
   }
-}
 
-today_tool_schema = {
-  "type": "function",
-  "function": {
-    "name": "get_weather_today",
-    "description": "Get the weather for the rest of the day, hourly, using the user's estimated location",
+def get_weather_today():
+  """The rest of today (or the next 6 hours, late at night) summed up: low, high, rain and when the sky changes"""
+  weather = get_snapshot()
+  hourly, offset = weather["hourly"], weather["utc_offset"]
+  now = time.time()
+  midnight = ((now + offset) // 86400 + 1) * 86400 - offset
+  hours = (hourly["time"] > now - 3600) & (hourly["time"] < max(midnight, now + 6 * 3600))
+  if not hours.any():
+    return "No hourly weather for the rest of today."
+
+  times, temperatures = hourly["time"][hours], hourly["temperature"][hours]
+  coldest, warmest = temperatures.argmin(), temperatures.argmax()
+  changes = []
+  for timestamp, code in zip(times, hourly["weather_code"][hours]):
+    words = describe(code)
+    if not changes or changes[-1][1] != words:
+      changes.append((clock(timestamp, offset), words))
+
+  return {
+    "from": clock(times[0], offset),
+    "to": clock(times[-1] + 3600, offset),
+    "low_f": temperatures[coldest], "low_at": clock(times[coldest], offset),
+    "high_f": temperatures[warmest], "high_at": clock(times[warmest], offset),
+    "precipitation_mm": hourly["precipitation"][hours].sum(),
+    "rainy_hours": int((hourly["rain"][hours] > 0).sum()),
+    "conditions": [f"{at} {words}" for at, words in changes],
   }
-}
 
-forcast_tool_schema = {
-  "type": "function",
-  "function": {
-    "name": "get_forcast",
-    "description": "Get the next 7 days forcast, using the user's estimated location",
-  }
-}
\ No newline at end of file
+def get_weather_forecast():
+  weather = get_snapshot()
+  daily, offset = weather["daily"], weather["utc_offset"]
+  return [
+    {
+      "day": local_time(daily["time"][index], offset).strftime("%a %b %-d"),
+      "high_f": daily["high"][index],
+      "low_f": daily["low"][index],
+      "precipitation_mm": daily["precipitation"][index],
+      "conditions": describe(daily["weather_code"][index]),
+    }
+    for index in range(len(daily["time"]))
+  ]
@@ -0,0 +1,113 @@
+# Copyright 2026 The Ronny Voice Foundation
+
+"""
+Per-turn latency tracing. Spans are just appended to a list while a turn is happening (cheap),
+and written out to a rotating JSONL file later by flush(), which runs as an idle task.
+Nothing in here gets sent anywhere, it's only a local file.
+
+Summarize with: python src/utils/trace.py [trace files...]
+"""
+import json
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+# Settings
+enabled = True
+log_dir = Path(__file__).resolve().parent.parent.parent / "logs"
+file_name = "trace.jsonl"
+max_file_size = 1024 * 1024 # Bytes before the file gets rotated
+backup_count = 5 # Rotated files to keep (trace.jsonl.1 is the newest)
+
+session = time.strftime("%Y%m%d-%H%M%S")
+turn = 0
+pending = [] # (turn, name, start, end, attributes) with perf_counter times
+wall_offset = time.time() - time.perf_counter() # To turn perf_counter times into real timestamps when writing
+
+def new_turn():
+    """Call at the start of every turn so spans can be grouped"""
+    global turn
+    turn += 1
+
+def record(name, start, end=None, **attributes):
+    """
+    Save a span. Times come from time.perf_counter().
+
+    :param end: Defaults to now
+    """
+    if enabled:
+        pending.append((turn, name, start, time.perf_counter() if end is None else end, attributes))
+
+@contextmanager
+def span(name, **attributes):
+    """Time everything inside the with block"""
+    start = time.perf_counter()
+    try:
+        yield attributes # Can be added to inside the block
+    finally:
+        record(name, start, **attributes)
+
+def rotate(path):
+    for index in range(backup_count - 1, 0, -1):
+        older = path.with_name(f"{path.name}.{index}")
+        if older.exists():
+            older.replace(path.with_name(f"{path.name}.{index + 1}"))
+    path.replace(path.with_name(f"{path.name}.1"))
+
+def flush():
+    """Write everything recorded so far to the trace file"""
+    global pending
+
+    if not pending:
+        return
+    spans, pending = pending, [] # Swap first so spans recorded while writing go in the next flush
+
+    log_dir.mkdir(parents=True, exist_ok=True)
+    path = log_dir / file_name
+    if path.exists() and path.stat().st_size > max_file_size:
+        rotate(path)
+
+    with open(path, "a") as file:
+        for turn_number, name, start, end, attributes in spans:
+            file.write(json.dumps({
+                "session": session,
+                "turn": turn_number,
+                "name": name,
+                "start": round(start + wall_offset, 4),
+                "duration_ms": round((end - start) * 1000, 2),
+                **attributes,
+            }) + "\n")
+
+def percentile(values, fraction):
+    values = sorted(values)
+    index = fraction * (len(values) - 1)
+    low = int(index)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (index - low)
+
+def summarize(paths):
+    """p50/p95 per span name, across every session in the files"""
+    durations = {}
+    sessions = set()
+    for path in paths:
+        with open(path) as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue # A half written line from a crash
+                sessions.add(entry["session"])
+                durations.setdefault(entry["name"], []).append(entry["duration_ms"])
+
+    lines = [f"{len(sessions)} sessions", f"{'stage':<32}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}"]
+    for name, values in sorted(durations.items()):
+        lines.append(f"{name:<32}{len(values):>7}{percentile(values, 0.5):>10.0f}{percentile(values, 0.95):>10.0f}")
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    paths = sys.argv[1:] or sorted(str(path) for path in log_dir.glob(file_name + "*"))
+    if not paths:
+        print(f"No traces found in {log_dir}")
+    else:
+        print(summarize(paths))
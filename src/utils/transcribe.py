@@ -2,19 +2,150 @@
 
 import soundfile as sf
 import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+from . import calls, trace
 
 model = 'whisper-large-v3-turbo'
-def start(client, sample_rate, audio_data):
+timeout = 8 # Seconds for Groq to answer, per try
+streaming = True # Transcribe pieces of the recording while the user is still talking
+segment_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="transcribe") # One at a time so each piece can use the last one as its prompt
+
+# Upload settings
+encoding = "flac" # One of the keys in encodings. Check report() on the actual device to pick the fastest one
+trim_threshold = 0.5 # Frames with a voice probability above this count as speech when trimming
+trim_padding = 0.25 # Seconds of non-speech to keep before and after the speech so words don't get clipped
+
+# name -> (file name Groq sees, soundfile format, soundfile subtype)
+encodings = {
+    "wav": ("audio.wav", "WAV", "FLOAT"), # What it used to send. Biggest, but nothing to encode
+    "pcm16": ("audio.wav", "WAV", "PCM_16"), # Half the size of float, still basically free to encode
+    "flac": ("audio.flac", "FLAC", "PCM_16"), # Lossless, usually about half of pcm16 again
+    "ogg": ("audio.ogg", "OGG", "VORBIS"),
+    "opus": ("audio.ogg", "OGG", "OPUS"), # Smallest, needs libsndfile 1.0.29+ and is the slowest to encode on the Pi
+}
+
+last_upload = {} # Stats for the last clip sent
+upload_totals = {} # encoding -> {"clips", "bytes", "encode_time", "upload_time"}
+
+def trim_silence(audio_data, probabilities, frame_length, sample_rate):
+    """
+    Cut off the non-speech at the start and end of a clip using the voice probability of every frame.
+    Returns a view, so nothing gets copied.
+
+    :param probabilities: Voice probability of each frame, from the recorder
+    :param frame_length: How many samples each probability covers
+    """
+    speech = [i for i, probability in enumerate(probabilities) if probability > trim_threshold]
+    if not speech:
+        return audio_data # Nothing confident enough to trim around, send it all
+
+    padding = int(trim_padding * sample_rate)
+    start = max(speech[0] * frame_length - padding, 0)
+    end = min((speech[-1] + 1) * frame_length + padding, len(audio_data))
+    return audio_data[start:end]
+
+def encode(audio_data, sample_rate):
+    """Encode a clip with the configured encoding. Returns the buffer, ready to upload."""
+    name, audio_format, subtype = encodings[encoding]
+    buffer = io.BytesIO()
+    buffer.name = name  # Groq needs this extension to identify the format. The name doesn't matter (I don't think)
+    sf.write(buffer, audio_data, sample_rate, format=audio_format, subtype=subtype)
+    buffer.seek(0)      # Reset pointer so Groq reads from the start
+    return buffer
+
+def start(client, sample_rate, audio_data, prompt=None, probabilities=None, frame_length=512):
     """
     Use a model from Groq to extract the text out of an audio clip.
-    
+
     :param audio_data: The file to get the text from
+    :param prompt: Text that came right before this clip, so Whisper keeps the same spelling and style
+    :param probabilities: Voice probability of each frame. If given, silence at the start and end is trimmed off before uploading
+    :param frame_length: How many samples each probability covers
     """
-    
-    buffer = io.BytesIO()
-    buffer.name = "audio.wav"  # Groq needs this extension to identify the format. The name doesn't matter (I don't think)
-    sf.write(buffer, audio_data, sample_rate, format='WAV')
-    buffer.seek(0)             # Reset pointer so Groq reads from the start
+    started = time.perf_counter()
+    original_length = len(audio_data)
+    if probabilities is not None and len(probabilities):
+        audio_data = trim_silence(audio_data, probabilities, frame_length, sample_rate)
+
+    buffer = encode(audio_data, sample_rate)
+    encoded = time.perf_counter()
+
+    def request(request_timeout):
+        buffer.seek(0) # A retry has to send it all again
+        transcriptions = calls.with_timeout(client, request_timeout).audio.transcriptions
+        if prompt:
+            return transcriptions.create(model=model, file=buffer, prompt=prompt)
+        return transcriptions.create(model=model, file=buffer)
+
+    transcription = calls.call("groq", request, timeout)
+    finished = time.perf_counter()
+    trace.record("transcription_encode", started, encoded, encoding=encoding)
+    trace.record("transcription_upload", encoded, finished, encoding=encoding, bytes=buffer.getbuffer().nbytes)
+
+    last_upload.update({
+        "encoding": encoding,
+        "bytes": buffer.getbuffer().nbytes,
+        "trimmed_seconds": (original_length - len(audio_data)) / sample_rate,
+        "encode_time": encoded - started,
+        "upload_time": finished - encoded, # Upload plus Whisper, can't split them apart from here
+    })
+    totals = upload_totals.setdefault(encoding, {"clips": 0, "bytes": 0, "encode_time": 0.0, "upload_time": 0.0})
+    totals["clips"] += 1
+    for key in ("bytes", "encode_time", "upload_time"):
+        totals[key] += last_upload[key]
+
+    return transcription.text
+
+def report():
+    """One line per encoding that's been used, with the averages per clip"""
+    lines = []
+    for name, totals in upload_totals.items():
+        clips = totals["clips"]
+        lines.append(
+            f"{name}: {clips} clips, {totals['bytes'] / clips / 1024:.1f}KB, "
+            f"encode {totals['encode_time'] / clips * 1000:.0f}ms, upload {totals['upload_time'] / clips * 1000:.0f}ms, "
+            f"total {(totals['encode_time'] + totals['upload_time']) / clips * 1000:.0f}ms"
+        )
+    return lines
+
+class StreamingTranscription:
+    """
+    Transcribes pieces of a recording in the background while the rest of it is still being recorded.
+    Pass submit as recorder.start_recording's on_segment, then call finish once the recording is done.
+    """
+    def __init__(self, client, sample_rate, frame_length=512):
+        self.client = client
+        self.sample_rate = sample_rate
+        self.frame_length = frame_length
+        self.futures = []
+        self.upload = {"encoding": encoding, "segments": 0, "bytes": 0, "encode_time": 0.0, "upload_time": 0.0} # Every segment added up, like last_upload for the whole turn
+
+    def submit(self, audio_data, probabilities=None):
+        """Queue a segment to be transcribed. Segments are done in order, each one prompted with the text before it."""
+        previous = self.futures[-1] if self.futures else None
+        self.futures.append(segment_executor.submit(self.transcribe_segment, audio_data, probabilities, previous))
+
+    def transcribe_segment(self, audio_data, probabilities, previous):
+        try:
+            prompt = previous.result() if previous else None
+        except Exception: # The last segment failed, that only costs this one its prompt
+            prompt = None
+        text = start(self.client, self.sample_rate, audio_data, prompt, probabilities, self.frame_length).strip()
+        self.upload["segments"] += 1 # Only the one segment_executor thread gets here, so no lock needed
+        for key in ("bytes", "encode_time", "upload_time"):
+            self.upload[key] += last_upload[key]
+        return text
+
+    def partial(self):
+        """The transcript of every segment submitted so far, or None while one is still being transcribed (or failed)"""
+        if not self.futures or not all(future.done() for future in self.futures):
+            return None
+        try:
+            return self.finish()
+        except Exception:
+            return None
 
-    transcription = client.audio.transcriptions.create(model=model, file=buffer)
-    return transcription.text
\ No newline at end of file
+    def finish(self):
+        """Wait for the segments still being transcribed (hopefully just the last short one) and stitch them together."""
+        return " ".join(text for text in (future.result() for future in self.futures) if text)
@@ -1,14 +1,28 @@
 # Copyright 2026 The Ronny Voice Foundation
 
+import asyncio
 from pvporcupine import Porcupine
-from pvrecorder import PvRecorder
+from .. import capture, trace
 
 async def wait_for_wake_word(client: Porcupine):
-    recorder = PvRecorder(frame_length=512)
-    recorder.start()
-    while recorder.is_recording:
-        frame = recorder.read()
-        keyword_index = client.process(frame)
+    """
+    Listen on the shared capture stream until the wake word is said.
+    Porcupine runs on its own thread (see capture.FrameWorker), so neither the audio callback nor the event loop waits on it.
+    """
+    loop = asyncio.get_running_loop()
+    detected = loop.create_future()
+
+    def on_frame(pcm, position):
+        keyword_index = client.process(pcm)
         if (keyword_index >= 0):
-            recorder.delete()
-            return
\ No newline at end of file
+            capture.detach()
+            capture.mark_wake(position + len(pcm)) # The recording should start right after the wake word
+            loop.call_soon_threadsafe(lambda: detected.done() or detected.set_result(position + len(pcm)))
+
+    capture.attach_worker(on_frame, "wake_word")
+    try:
+        end_of_keyword = await detected
+        # From the end of the wake word coming in to the event loop knowing about it, not how long it sat waiting
+        trace.record("wake_detection", capture.heard_at(end_of_keyword))
+    finally:
+        capture.detach() # In case this got cancelled